@@ -0,0 +1,131 @@
+import time
+from typing import Dict, Any, Optional, List
+
+from prefect import flow, task
+
+from flows.collection import isracard_flow, otsar_hahayal_flow
+from flows.common.tasks.archive_task import archive_raw_scrape
+from flows.common.tasks.mongo_task import load_transactions_to_mongo_task, load_to_mongo_task
+from flows.common.tasks.mysql_task import load_to_mysql, cache_loaded_transaction_ids, get_account_watermark, \
+    update_account_watermark, refresh_mtd_running_totals_task
+from src.interface import MONGO_CREDIT_TABLE_NAME, MONGO_BANK_ACCOUNT_TABLE_NAME
+from src.interface.collection.isracard.model import IsracardCardCredentialsFactory
+from src.interface.collection.worker_pool import get_scraper_worker_pool
+from src.interface.common.utils import create_mongo_key, get_logger, get_incremental_start_date, \
+    track_max_transaction_dates, get_mysql_pool_stats, bootstrap_mongo_indexes, get_balance_account_numbers, \
+    DEFAULT_WATERMARK_OVERLAP_DAYS
+
+DEFAULT_CONCURRENCY_LIMIT = 2
+DEFAULT_CARD_TIMEOUT_SECONDS = 60 * 10
+DEFAULT_OTSAR_TIMEOUT_SECONDS = 60 * 15
+
+
+@task()
+def collect_isracard_card(card_suffix: str, credentials: Dict[str, str], start_date: Optional[str] = None,
+                          future_months_to_scrape: Optional[int] = None,
+                          timeout: float = DEFAULT_CARD_TIMEOUT_SECONDS, incremental: bool = True,
+                          overlap_days: int = DEFAULT_WATERMARK_OVERLAP_DAYS) -> Dict[str, Any]:
+    started = time.monotonic()
+    watermark = get_account_watermark.fn(credentials, isracard_flow.WATERMARK_SOURCE, card_suffix) \
+        if incremental and not start_date else None
+    scraper_params = isracard_flow.transform_scraper_params(start_date=start_date,
+                                                            future_months_to_scrape=future_months_to_scrape,
+                                                            watermark=watermark,
+                                                            overlap_days=overlap_days)
+    data = isracard_flow.fetch.fn(card_suffix, scraper_params, timeout)
+    archive_raw_scrape.fn(isracard_flow.WATERMARK_SOURCE, data)
+    load_transactions_to_mongo_task.fn(data, credentials, table_name=MONGO_CREDIT_TABLE_NAME)
+    processed_data = isracard_flow.translate_to_mysql_data_model.fn(data)
+    load_to_mysql.fn(processed_data, credentials, 'credit_transaction')
+    refresh_mtd_running_totals_task.fn(credentials, processed_data)
+    update_account_watermark.fn(credentials, isracard_flow.WATERMARK_SOURCE, card_suffix,
+                                track_max_transaction_dates(processed_data))
+    return dict(transactions=len(processed_data), elapsed_seconds=round(time.monotonic() - started, 1))
+
+
+@task()
+def collect_otsar_hahayal(credentials: Dict[str, str], start_date: Optional[str] = None,
+                          timeout: float = DEFAULT_OTSAR_TIMEOUT_SECONDS, incremental: bool = True,
+                          overlap_days: int = DEFAULT_WATERMARK_OVERLAP_DAYS) -> Dict[str, Any]:
+    started = time.monotonic()
+    watermark = get_account_watermark.fn(credentials, otsar_hahayal_flow.WATERMARK_SOURCE,
+                                         otsar_hahayal_flow.OTSAR_CREDENTIALS_BLOCK,
+                                         get_balance_account_numbers(credentials)) \
+        if incremental and not start_date else None
+    start_date = start_date or get_incremental_start_date(watermark, overlap_days, default_days=30)
+    otsar_hahayal_flow.validate_inputs.fn(start_date)
+    raw_trans = otsar_hahayal_flow.fetch.fn(start_date, timeout)
+    account_number = raw_trans.get('accounts', [{}])[0].get('accountNumber')
+    raw_trans['mongo_key'] = create_mongo_key((start_date, account_number))
+    load_to_mongo_task.fn(raw_trans, mongo_param=credentials, table_name=MONGO_BANK_ACCOUNT_TABLE_NAME)
+    archive_raw_scrape.fn(otsar_hahayal_flow.WATERMARK_SOURCE, raw_trans)
+    otsar_hahayal_flow.ensure_transaction_ids_migrated.fn(credentials)
+    processed_transaction_data, processed_balance_data = \
+        otsar_hahayal_flow.translate_bank_transaction_to_mysql_data_model.fn(raw_trans)
+    load_to_mysql.fn(processed_transaction_data, credentials, 'credit_transaction')
+    cache_loaded_transaction_ids.fn(processed_transaction_data)
+    refresh_mtd_running_totals_task.fn(credentials, processed_transaction_data)
+    load_to_mysql.fn(processed_balance_data, credentials, 'bank_balance')
+    update_account_watermark.fn(credentials, otsar_hahayal_flow.WATERMARK_SOURCE,
+                                otsar_hahayal_flow.OTSAR_CREDENTIALS_BLOCK,
+                                track_max_transaction_dates(processed_transaction_data))
+    return dict(transactions=len(processed_transaction_data), elapsed_seconds=round(time.monotonic() - started, 1))
+
+
+def summarize_collection(sources: Dict[str, Any]) -> Dict[str, Any]:
+    summary = dict(sources=[], succeeded=0, failed=0, transactions=0)
+    for source, future in sources.items():
+        state = future.wait()
+        result = state.result(raise_on_failure=False)
+        succeeded = state.is_completed()
+        source_summary = dict(source=source, status=state.name, transactions=0, elapsed_seconds=None, error=None)
+        if succeeded:
+            source_summary.update(result)
+        else:
+            source_summary['error'] = str(result)
+        summary['sources'].append(source_summary)
+        summary['succeeded' if succeeded else 'failed'] += 1
+        summary['transactions'] += source_summary['transactions']
+    return summary
+
+
+@flow
+def collect_all_accounts(card_suffixes: Optional[List[str]] = None, include_otsar: bool = True,
+                         start_date: Optional[str] = None, future_months_to_scrape: Optional[int] = None,
+                         concurrency_limit: int = DEFAULT_CONCURRENCY_LIMIT,
+                         card_timeout_seconds: float = DEFAULT_CARD_TIMEOUT_SECONDS,
+                         otsar_timeout_seconds: float = DEFAULT_OTSAR_TIMEOUT_SECONDS,
+                         incremental: bool = True,
+                         overlap_days: int = DEFAULT_WATERMARK_OVERLAP_DAYS) -> Dict[str, Any]:
+    """
+    Fan out over every configured card (and the otsar account). Scrapes run concurrently, bounded by the size of
+    the scraper worker pool, and a failing source is reported in the summary without failing the others.
+    return: A summary of every source with its state, loaded transactions and elapsed time
+    """
+    logger = get_logger()
+    credentials = isracard_flow.get_flow_db_secrets()
+    get_scraper_worker_pool(size=concurrency_limit)
+    bootstrap_mongo_indexes(credentials)
+    card_suffixes = card_suffixes or list(IsracardCardCredentialsFactory.user_map.keys())
+
+    sources = {}
+    for card_suffix in card_suffixes:
+        sources[f"isracard_{card_suffix}"] = collect_isracard_card.submit(
+            card_suffix, credentials, start_date=start_date, future_months_to_scrape=future_months_to_scrape,
+            timeout=card_timeout_seconds, incremental=incremental, overlap_days=overlap_days)
+    if include_otsar:
+        sources["otsar_hahayal"] = collect_otsar_hahayal.submit(credentials, start_date=start_date,
+                                                                timeout=otsar_timeout_seconds,
+                                                                incremental=incremental, overlap_days=overlap_days)
+
+    summary = summarize_collection(sources)
+    if logger:
+        logger.info(f"collected {summary['transactions']} transactions, "
+                    f"{summary['succeeded']} sources succeeded and {summary['failed']} failed")
+        logger.info(f"mysql pools {get_mysql_pool_stats()}")
+    return summary
+
+
+if __name__ == '__main__':
+    flow_param = dict(concurrency_limit=3)
+    collect_all_accounts(**flow_param)
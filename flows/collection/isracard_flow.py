@@ -1,24 +1,36 @@
 import json
 import sys
-from datetime import datetime, timedelta
-from subprocess import run, PIPE
-from typing import List, Dict, Any, Optional, Union
+from datetime import datetime, date
+from typing import List, Dict, Any, Optional, Union, Tuple
 
+from dateutil.relativedelta import relativedelta
 from prefect import flow, task
 from pydantic import ValidationError
 
-from flows.common.tasks.mysql_task import load_to_mysql
+from flows.common.tasks.archive_task import archive_raw_scrape, close_archive_writer
+from flows.common.tasks.backfill_task import offline_backfill
+from flows.common.tasks.mysql_task import load_to_mysql, get_account_watermark, update_account_watermark, \
+    refresh_mtd_running_totals_task
 from src.core.common import DATE_FORMAT
 from src.core.common import get_db_secrets
 from src.core.collection.model import IsracardCredentials
-from src.interface import MONGO_CREDIT_TABLE_NAME, IBS_ISRACARD_PATH, INTERFACE_WORKING_DIR
+from src.interface import MONGO_CREDIT_TABLE_NAME
 from src.interface.collection.isracard.model import IsracardCardCredentialsFactory
+from src.interface.collection.worker_pool import get_scraper_worker_pool, DEFAULT_JOB_TIMEOUT_SECONDS
 from flows.common.tasks.mongo_task import load_transactions_to_mongo_task
 
 sys.path.append("../../src/core")
 sys.path.append("../../src/interface")
-from src.interface.common.utils import validate_documents, unpack_to_unnested_format, translate_to_mysql_format
+from src.interface.common.archive import RawScrapeArchive
+from src.interface.common.backfill import ARCHIVE_BACKFILL_SOURCE, DEFAULT_BACKFILL_WORKERS
+from src.interface.common.batch import TransactionBatch
+from src.interface.common.running_totals import get_affected_months, refresh_affected_mtd_running_totals
+from src.interface.common.utils import validate_documents, \
+    get_logger, iter_account_chunks, load_transactions_to_mongo, _load_to_mysql, get_incremental_start_date, \
+    track_max_transaction_dates, DEFAULT_WATERMARK_OVERLAP_DAYS
 
+DEFAULT_STREAM_CHUNK_SIZE = 500
+WATERMARK_SOURCE = 'isracard'
 
 @task()
 def get_flow_db_secrets() -> Dict[str, str]:
@@ -34,68 +46,143 @@ def get_isracard_secrets(card_suffix: str) -> IsracardCredentials:
 
 
 def transform_scraper_params(start_date: Optional[datetime.date] = None
-                             , future_months_to_scrape: Optional[str] = None) -> Dict[str, Union[datetime, int]]:
+                             , future_months_to_scrape: Optional[str] = None
+                             , watermark: Optional[date] = None
+                             , overlap_days: int = DEFAULT_WATERMARK_OVERLAP_DAYS) -> Dict[str, Union[datetime, int]]:
     future_months_to_scrape = 1 if not future_months_to_scrape else future_months_to_scrape
     if future_months_to_scrape < 1:
         raise ValidationError(f'future_months_to_scrape {future_months_to_scrape} is not valid')
     if start_date:
         datetime.strptime(start_date, DATE_FORMAT)
 
-    start_date = datetime.strftime(datetime.now() - timedelta(days=31), DATE_FORMAT) if not start_date else start_date
+    start_date = get_incremental_start_date(watermark, overlap_days, default_days=31) if not start_date else start_date
     return dict(start_date=start_date, future_months_to_scrape=future_months_to_scrape)
 
 
-@task()
-def fetch(card_suffix: str, time_param: Dict[str, Union[datetime, int]]):
+def get_scraper_job(card_suffix: str, time_param: Dict[str, Union[datetime, int]]) -> Tuple[
+    Dict[str, Any], Dict[str, str]]:
     isracard_credentials_block = get_isracard_secrets(card_suffix)
-    cmd = ["node"
-        , IBS_ISRACARD_PATH
-        , "--date"
-        , f"{time_param['start_date']}"
-        , "--months"
-        , f"{time_param['future_months_to_scrape']}"
-        , '--id'
-        , f"{isracard_credentials_block.user_name.get_secret_value()}"
-        , '--card6num'
-        , f"{isracard_credentials_block.cardnum.get_secret_value()}"
-        , '--password'
-        , f"{isracard_credentials_block.password.get_secret_value()}"
-           ]
-    res = run(cmd, stdout=PIPE, stderr=PIPE, universal_newlines=True, cwd=INTERFACE_WORKING_DIR)
-    if res.returncode == 0 and not res.stderr:
-        return json.loads(res.stdout)
-    raise ChildProcessError(f'fetching process failed: {res.stderr}')
+    options = dict(startDate=f"{time_param['start_date']}",
+                   futureMonthsToScrape=int(time_param['future_months_to_scrape']),
+                   combineInstallments=False,
+                   showBrowser=False,
+                   additionalTransactionInformation=True)
+    credentials = dict(id=isracard_credentials_block.user_name.get_secret_value(),
+                       card6Digits=isracard_credentials_block.cardnum.get_secret_value(),
+                       password=isracard_credentials_block.password.get_secret_value())
+    return options, credentials
+
+
+@task()
+def fetch(card_suffix: str, time_param: Dict[str, Union[datetime, int]],
+          timeout: float = DEFAULT_JOB_TIMEOUT_SECONDS):
+    options, credentials = get_scraper_job(card_suffix, time_param)
+    res = get_scraper_worker_pool().run('isracard', options, credentials, timeout)
+    if logger := get_logger():
+        logger.info(f"isracard {card_suffix} scraped by worker {res.worker_pid} "
+                    f"(job #{res.worker_job_number}) in {res.elapsed_ms:.0f}ms")
+    if res.success:
+        return res.data
+    raise ChildProcessError(f'fetching process failed: {res.error}')
 
 
 @task()
-def translate_to_mysql_data_model(data: List[Dict[str, Any]]):
+def fetch_and_load_stream(card_suffix: str, time_param: Dict[str, Union[datetime, int]],
+                          credentials: Dict[str, str], chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE,
+                          fields_to_update: Optional[List[str]] = None, identifier: Optional[str] = None,
+                          timeout: float = DEFAULT_JOB_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """
+    Scrape in streaming mode and load bounded chunks to mongo and mysql as transactions arrive,
+    so memory does not grow with the scraped window. Mongo is skipped for backfills (fields_to_update).
+    return: The number of loaded transactions and the max transaction date per account
+    """
+    options, scraper_credentials = get_scraper_job(card_suffix, time_param)
+    records = get_scraper_worker_pool().stream('isracard', options, scraper_credentials, timeout)
+    archive_writer = RawScrapeArchive().open_writer(WATERMARK_SOURCE) if not fields_to_update else None
+    loaded = 0
+    max_dates = {}
+    affected_months = {}
+    try:
+        for account_number, chunk in iter_account_chunks(records, chunk_size):
+            batch = TransactionBatch.from_scraped(chunk, account_number)
+            if not fields_to_update:
+                archive_raw_scrape.fn(WATERMARK_SOURCE, batch, account_number, archive_writer)
+                load_transactions_to_mongo(batch, credentials, MONGO_CREDIT_TABLE_NAME)
+            processed_chunk = batch.to_mysql_format()
+            _load_to_mysql(processed_chunk, credentials, 'credit_transaction', fields_to_update, identifier)
+            track_max_transaction_dates(processed_chunk, max_dates)
+            get_affected_months(processed_chunk, affected_months)
+            loaded += len(chunk)
+    finally:
+        # the chunks archived so far are kept when the stream fails
+        if archive_writer is not None:
+            close_archive_writer.fn(archive_writer)
+    refresh_affected_mtd_running_totals(credentials, affected_months)
+    if logger := get_logger():
+        logger.info(f"streamed {loaded} isracard {card_suffix} transactions in chunks of {chunk_size}")
+    return dict(transactions=loaded, max_dates=max_dates)
+
+
+@task()
+def translate_to_mysql_data_model(data: List[Dict[str, Any]]) -> TransactionBatch:
     validate_documents(data)
-    transformed_data = unpack_to_unnested_format(data)
-    transformed_data = translate_to_mysql_format(transformed_data)
-    return transformed_data
+    return TransactionBatch.from_scraped(data).to_mysql_format()
 
 
 @flow
 def scrape_isracard(card_suffix: str, start_date: Optional[str] = None,
-                    future_months_to_scrape: Optional[int] = None):
+                    future_months_to_scrape: Optional[int] = None, stream: bool = False,
+                    chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, incremental: bool = True,
+                    overlap_days: int = DEFAULT_WATERMARK_OVERLAP_DAYS):
     credentials = get_flow_db_secrets()
+    watermark = get_account_watermark(credentials, WATERMARK_SOURCE, card_suffix) \
+        if incremental and not start_date else None
     scraper_params = transform_scraper_params(start_date=start_date
-                                              , future_months_to_scrape=future_months_to_scrape)
+                                              , future_months_to_scrape=future_months_to_scrape
+                                              , watermark=watermark
+                                              , overlap_days=overlap_days)
+    if stream:
+        loaded = fetch_and_load_stream(card_suffix, scraper_params, credentials, chunk_size)
+        update_account_watermark(credentials, WATERMARK_SOURCE, card_suffix, loaded['max_dates'])
+        return
     data = fetch(card_suffix, scraper_params)
+    archive_raw_scrape(WATERMARK_SOURCE, data)
     load_transactions_to_mongo_task(data, credentials, table_name=MONGO_CREDIT_TABLE_NAME)
     processed_data = translate_to_mysql_data_model(data)
     load_to_mysql(processed_data, credentials, 'credit_transaction')
+    refresh_mtd_running_totals_task(credentials, processed_data)
+    update_account_watermark(credentials, WATERMARK_SOURCE, card_suffix,
+                             track_max_transaction_dates(processed_data))
 
 
 @flow
 def backfill_isracard(card_suffix: str, fields_to_update: List[str], start_date: Optional[str] = None,
-                      future_months_to_scrape: Optional[int] = None):
+                      future_months_to_scrape: Optional[int] = None, stream: bool = True,
+                      chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE, offline: bool = False,
+                      read_from: str = ARCHIVE_BACKFILL_SOURCE, max_workers: int = DEFAULT_BACKFILL_WORKERS):
+    """
+    Update `fields_to_update` of stored transactions. By default the months are scraped again,
+    `offline=True` recomputes them from the raw archive (or `read_from="mongo"`) without a browser session.
+    """
     credentials = get_flow_db_secrets()
+    if offline:
+        start_month = start_date[:7] if start_date else None
+        end_month = (datetime.strptime(start_date, DATE_FORMAT).date()
+                     + relativedelta(months=future_months_to_scrape)).strftime('%Y-%m') \
+            if start_date and future_months_to_scrape else None
+        offline_backfill(credentials, WATERMARK_SOURCE, fields_to_update, card_suffix, start_month, end_month,
+                         read_from, max_workers)
+        return
     scraper_params = transform_scraper_params(start_date=start_date
                                               , future_months_to_scrape=future_months_to_scrape)
+    if stream:
+        fetch_and_load_stream(card_suffix, scraper_params, credentials, chunk_size,
+                              fields_to_update=fields_to_update, identifier="id")
+        return
     data = fetch(card_suffix, scraper_params)
     processed_data = translate_to_mysql_data_model(data)
     load_to_mysql(processed_data, credentials, 'credit_transaction', fields_to_update, identifier="id")
+    refresh_mtd_running_totals_task(credentials, processed_data)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,21 @@
+from prefect import flow
+
+from src.core.common import get_db_secrets
+from src.interface.common.migrations import migrate_transaction_schema, TRANSACTION_TABLE_NAME
+from src.interface.common.utils import get_logger
+
+
+@flow
+def migrate_transaction_schema_flow(table_name: str = TRANSACTION_TABLE_NAME, env: str = None):
+    """
+    Convert the transaction date columns to DATETIME and add the range read indexes, safe to rerun
+    """
+    credentials = get_db_secrets(env)
+    migrated = migrate_transaction_schema(credentials, table_name)
+    if logger := get_logger():
+        logger.info(f"migrated {table_name}: {migrated}")
+    return migrated
+
+
+if __name__ == '__main__':
+    migrate_transaction_schema_flow()
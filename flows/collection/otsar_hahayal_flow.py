@@ -1,22 +1,32 @@
-import json
+from pathlib import Path
 from typing import Optional, Dict, Any, Tuple, List
 
 from prefect import task, flow
-from subprocess import run, PIPE
 
-from flows.common.tasks.mysql_task import load_to_mysql
+from flows.common.tasks.archive_task import archive_raw_scrape
+from flows.common.tasks.mysql_task import load_to_mysql, cache_loaded_transaction_ids, get_account_watermark, \
+    update_account_watermark, refresh_mtd_running_totals_task
 from src.core.common import DATE_FORMAT
 from src.core.common import get_db_secrets
-from src.interface import IBS_OTSAR_PATH, INTERFACE_WORKING_DIR, MONGO_BANK_ACCOUNT_TABLE_NAME
-from src.interface.common.model import MySqlTransaction, MySqlBalance
-from datetime import datetime, timedelta
-
-from src.interface.common.utils import translate_to_mysql_format, unpack_to_unnested_format, \
-    translate_balance_to_mysql_format, add_transaction_date_and_account_to_balance_data, validate_documents, \
-    create_mongo_key
+from src.interface import MONGO_BANK_ACCOUNT_TABLE_NAME, SCRAPER_PROFILES_DIR
+from src.interface.collection.worker_pool import get_scraper_worker_pool, DEFAULT_JOB_TIMEOUT_SECONDS
+from src.interface.common.batch import TransactionBatch
+from src.interface.common.ids import TransactionIdCache
+from src.interface.common.model import MySqlBalance
+from src.interface.common.normalizer import TransactionNormalizer
+from src.interface.common.running_totals import get_affected_months, refresh_affected_mtd_running_totals
+from datetime import datetime
+
+from src.interface.common.utils import translate_balance_to_mysql_format, \
+    add_transaction_date_and_account_to_balance_data, validate_documents, create_mongo_key, get_logger, \
+    get_incremental_start_date, track_max_transaction_dates, get_mongo_client, migrate_legacy_transaction_ids, \
+    get_balance_account_numbers, is_transaction_id_migration_done, DEFAULT_WATERMARK_OVERLAP_DAYS
 from flows.common.tasks.mongo_task import load_to_mongo_task
 from src.core.collection.model import BankCredentials
 
+OTSAR_CREDENTIALS_BLOCK = "otsar-cred"
+WATERMARK_SOURCE = 'otsar_hahayal'
+
 
 @task()
 def get_credentials(env:str = None) -> Dict[str, str]:
@@ -33,43 +43,50 @@ def validate_inputs(start_date: str):
 
 
 @task(retries=2, retry_delay_seconds=20)
-def fetch(start_date: str):
-    bankcredentials_block = BankCredentials.load("otsar-cred")
-
-    cmd = ["node"
-        , IBS_OTSAR_PATH
-        , "--date"
-        , f"'{start_date}'"
-        , '--username'
-        , f"{bankcredentials_block.user_name.get_secret_value()}"
-        , '--password'
-        , f"{bankcredentials_block.password.get_secret_value()}"
-           ]
-    res = run(cmd, stdout=PIPE, stderr=PIPE, universal_newlines=True, cwd=INTERFACE_WORKING_DIR)
-    if res.returncode == 0 and not res.stderr:
-        return json.loads(res.stdout)
-    raise ChildProcessError(f'fetching process failed: {res.stderr}')
+def fetch(start_date: str, timeout: float = DEFAULT_JOB_TIMEOUT_SECONDS):
+    bankcredentials_block = BankCredentials.load(OTSAR_CREDENTIALS_BLOCK)
+    options = dict(startDate=start_date,
+                   combineInstallments=False,
+                   showBrowser=True,
+                   userDataDir=str(Path(SCRAPER_PROFILES_DIR) / OTSAR_CREDENTIALS_BLOCK))
+    credentials = dict(username=bankcredentials_block.user_name.get_secret_value(),
+                       password=bankcredentials_block.password.get_secret_value())
+    res = get_scraper_worker_pool().run('otsarHahayal', options, credentials, timeout)
+    if logger := get_logger():
+        logger.info(f"otsar hahayal scraped by worker {res.worker_pid} "
+                    f"(job #{res.worker_job_number}) in {res.elapsed_ms:.0f}ms")
+    if res.success:
+        return res.data
+    raise ChildProcessError(f'fetching process failed: {res.error}')
 
 
 @task()
 def translate_bank_transaction_to_mysql_data_model(data: Dict[str, Any]) -> Tuple[
-    List[MySqlTransaction], List[MySqlBalance]]:
+    TransactionBatch, List[MySqlBalance]]:
     account_data = next(iter(data.get('accounts')))
     transactions = account_data.get('txns')
     validate_documents(transactions)
     balance = account_data.get('summary')
     account_number = account_data.get('accountNumber')
-    balance = add_transaction_date_and_account_to_balance_data(balance, transactions, account_number)
+    normalizer = TransactionNormalizer(transactions, account_number)
+    batch = TransactionBatch.from_scraped(transactions, normalizer=normalizer)
+    balance = add_transaction_date_and_account_to_balance_data(balance, transactions, account_number,
+                                                               normalizer.max_dates.get(str(account_number)))
     transformed_balance_data = translate_balance_to_mysql_format(balance)
-    transformed_transaction_data = unpack_to_unnested_format(transactions, account_number)
-    transformed_transaction_data = translate_to_mysql_format(transformed_transaction_data, create_id=True)
+    id_cache = TransactionIdCache()
+    transformed_transaction_data = batch.to_mysql_format(create_id=True, id_cache=id_cache)
+    id_cache.close()
     return transformed_transaction_data, [transformed_balance_data]
 
 
 @flow
-def scrape_otsar_hahayal(start_date: Optional[str] = None):
+def scrape_otsar_hahayal(start_date: Optional[str] = None, incremental: bool = True,
+                         overlap_days: int = DEFAULT_WATERMARK_OVERLAP_DAYS):
     secrets = get_credentials()
-    start_date = start_date or (datetime.now() - timedelta(days=30)).strftime(DATE_FORMAT)
+    watermark = get_account_watermark(secrets, WATERMARK_SOURCE, OTSAR_CREDENTIALS_BLOCK,
+                                      get_balance_account_numbers(secrets)) \
+        if incremental and not start_date else None
+    start_date = start_date or get_incremental_start_date(watermark, overlap_days, default_days=30)
     validate_inputs(start_date)
 
     raw_trans = fetch(start_date, wait_for=[validate_inputs])
@@ -77,10 +94,56 @@ def scrape_otsar_hahayal(start_date: Optional[str] = None):
     raw_trans['mongo_key'] = create_mongo_key((start_date, account_number))
 
     load_to_mongo_task(raw_trans, mongo_param=secrets, table_name=MONGO_BANK_ACCOUNT_TABLE_NAME, wait_for=[create_mongo_key])
+    archive_raw_scrape(WATERMARK_SOURCE, raw_trans)
 
+    ensure_transaction_ids_migrated(secrets)
     processed_transaction_data, processed_balance_data = translate_bank_transaction_to_mysql_data_model(raw_trans)
     load_to_mysql(processed_transaction_data, secrets, 'credit_transaction')
+    cache_loaded_transaction_ids(processed_transaction_data)
+    refresh_mtd_running_totals_task(secrets, processed_transaction_data)
     load_to_mysql(processed_balance_data, secrets, 'bank_balance')
+    update_account_watermark(secrets, WATERMARK_SOURCE, OTSAR_CREDENTIALS_BLOCK,
+                             track_max_transaction_dates(processed_transaction_data))
+
+
+def run_otsar_transaction_id_migration(secrets: Dict[str, str]) -> int:
+    """
+    Migrate the legacy sha256 transaction ids, recomputed from the raw scrapes stored in mongo
+    return: The number of mapped ids
+    """
+    collection = get_mongo_client(secrets).get_collection(MONGO_BANK_ACCOUNT_TABLE_NAME)
+    transactions = [transaction
+                    for doc in collection.find({}, projection={'accounts': True, '_id': False})
+                    if doc.get('accounts') for transaction in TransactionNormalizer(doc)]
+    migrated = migrate_legacy_transaction_ids(secrets, transactions)
+    # as after any load, the months whose rows changed are rebuilt
+    refresh_affected_mtd_running_totals(secrets, get_affected_months(TransactionBatch.from_records(transactions),
+                                                                     account_field='accountNumber'))
+    # cached ids were computed before the migration, let the next scrape check every row against mysql again
+    id_cache = TransactionIdCache()
+    id_cache.clear()
+    id_cache.close()
+    if logger := get_logger():
+        logger.info(f"mapped {migrated} legacy transaction ids")
+    return migrated
+
+
+@task()
+def ensure_transaction_ids_migrated(secrets: Dict[str, str]):
+    """
+    Rows loaded before the blake2b ids keep their sha256 ids until migrated, a load before the migration would
+    insert every one of them again under its new id. Runs the migration once, before the first load.
+    """
+    if not is_transaction_id_migration_done(secrets):
+        run_otsar_transaction_id_migration(secrets)
+
+
+@flow
+def migrate_otsar_transaction_ids():
+    """
+    One-time migration of the legacy sha256 transaction ids, also run by the first otsar load
+    """
+    run_otsar_transaction_id_migration(get_credentials())
 
 
 if __name__ == '__main__':
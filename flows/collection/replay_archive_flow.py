@@ -0,0 +1,48 @@
+from typing import Optional, List
+
+from prefect import flow
+
+from flows.collection.otsar_hahayal_flow import ensure_transaction_ids_migrated
+from flows.common.tasks.archive_task import replay_archive_task
+from src.core.common import get_db_secrets
+from src.interface.common.archive import RawScrapeArchive, CREATE_ID_SOURCES
+from src.interface.common.utils import get_logger, benchmark_mysql_load_modes
+
+
+@flow
+def replay_raw_archive(source: str, account_number: Optional[str] = None, start_month: Optional[str] = None,
+                       end_month: Optional[str] = None, fields_to_update: Optional[List[str]] = None,
+                       mongo_table_name: Optional[str] = None):
+    """
+    Reload archived raw scrapes (months as YYYY-MM) into mysql without touching the network.
+    With fields_to_update only those columns of existing rows are updated.
+    """
+    credentials = get_db_secrets()
+    if source in CREATE_ID_SOURCES:
+        ensure_transaction_ids_migrated(credentials)
+    replayed = replay_archive_task(credentials, source, account_number, start_month, end_month,
+                                   fields_to_update=fields_to_update,
+                                   identifier="id" if fields_to_update else None,
+                                   mongo_table_name=mongo_table_name)
+    if logger := get_logger():
+        logger.info(f"replayed {replayed} archived {source} transactions")
+
+
+@flow
+def benchmark_mysql_loaders(source: str, account_number: Optional[str] = None, start_month: Optional[str] = None,
+                            end_month: Optional[str] = None, table_name: str = 'credit_transaction'):
+    """
+    Compare the executemany and LOAD DATA load paths on archived transactions, against scratch tables
+    """
+    credentials = get_db_secrets()
+    batch = RawScrapeArchive().read(source, account_number, start_month, end_month)
+    processed = batch.to_mysql_format(create_id=source in CREATE_ID_SOURCES)
+    timings = benchmark_mysql_load_modes(processed, credentials, table_name)
+    if logger := get_logger():
+        logger.info(f"loaded {len(processed)} transactions: {timings}")
+    return timings
+
+
+if __name__ == '__main__':
+    flow_param = dict(source='isracard', start_month='2024-01', fields_to_update=["category_raw"])
+    replay_raw_archive(**flow_param)
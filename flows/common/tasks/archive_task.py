@@ -0,0 +1,45 @@
+from typing import Dict, Any, Optional, List, Union
+
+from prefect import task
+
+from src.interface.common.archive import RawScrapeArchive, ArchiveEntry, ArchiveWriter, replay_archive
+from src.interface.common.utils import get_logger
+
+
+@task()
+def archive_raw_scrape(source: str, data: Union[List[Dict[str, Any]], Dict[str, Any]],
+                       account_number: str = 'NA', writer: Optional[ArchiveWriter] = None) -> List[ArchiveEntry]:
+    """
+    Archive a raw scrape to parquet. The archive is a secondary copy, a failure is logged and the scrape goes on.
+    Chunks of one streamed scrape share a `writer`, so they land in one file per month (see `close_archive_writer`)
+    return: The written manifest entries, none for a `writer` until it is closed
+    """
+    try:
+        if writer is not None:
+            writer.write(data, account_number)
+            return []
+        return RawScrapeArchive().write(source, data, account_number)
+    except Exception as e:
+        if logger := get_logger():
+            logger.warning(f"failed to archive raw {source} scrape: {e}")
+        return []
+
+
+@task()
+def close_archive_writer(writer: ArchiveWriter) -> List[ArchiveEntry]:
+    try:
+        return writer.close()
+    except Exception as e:
+        if logger := get_logger():
+            logger.warning(f"failed to archive raw {writer.source} scrape: {e}")
+        return []
+
+
+@task()
+def replay_archive_task(db_param: Dict[str, str], source: str, account_number: Optional[str] = None,
+                        start_month: Optional[str] = None, end_month: Optional[str] = None,
+                        fields_to_update: Optional[List[str]] = None, identifier: Optional[str] = None,
+                        mongo_table_name: Optional[str] = None) -> int:
+    return replay_archive(db_param, source, account_number, start_month, end_month,
+                          fields_to_update=fields_to_update, identifier=identifier,
+                          mongo_table_name=mongo_table_name)
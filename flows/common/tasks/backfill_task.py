@@ -0,0 +1,15 @@
+from typing import Dict, Any, Optional, List
+
+from prefect import task
+
+from src.interface.common.backfill import run_backfill, ARCHIVE_BACKFILL_SOURCE, DEFAULT_BACKFILL_WORKERS
+from src.interface.common.utils import get_logger
+
+
+@task()
+def offline_backfill(db_param: Dict[str, Any], source: str, fields_to_update: List[str],
+                     account_number: Optional[str] = None, start_month: Optional[str] = None,
+                     end_month: Optional[str] = None, read_from: str = ARCHIVE_BACKFILL_SOURCE,
+                     max_workers: int = DEFAULT_BACKFILL_WORKERS) -> Dict[str, int]:
+    return run_backfill(db_param, source, fields_to_update, account_number, start_month, end_month, read_from,
+                        max_workers, logger=get_logger())
@@ -2,6 +2,8 @@ from typing import Dict, Any, Optional, List
 
 from prefect.tasks import task
 
+from src.interface.common.async_db import run_in_db_executor
+from src.interface.common.model import MongoIngestResult
 from src.interface.common.utils import load_to_mongo, \
     load_transactions_to_mongo
 
@@ -13,14 +15,14 @@ def load_balance_to_mongo(mongo_docs: Optional[List[Dict[str, Any]]], mongo_para
 
 @task()
 def load_transactions_to_mongo_task(mongo_docs: Optional[List[Dict[str, Any]]], mongo_param: Dict[str, str],
-                                    table_name: str):
-    load_transactions_to_mongo(mongo_docs, mongo_param, table_name)
+                                    table_name: str) -> MongoIngestResult:
+    return load_transactions_to_mongo(mongo_docs, mongo_param, table_name)
 
 
 @task()
 async def async_load_transactions_to_mongo_task(mongo_docs: Optional[List[Dict[str, Any]]], mongo_param: Dict[str, str],
-                                                table_name: str):
-    load_transactions_to_mongo(mongo_docs, mongo_param, table_name)
+                                                table_name: str) -> MongoIngestResult:
+    return await run_in_db_executor(load_transactions_to_mongo, mongo_docs, mongo_param, table_name)
 
 
 @task()
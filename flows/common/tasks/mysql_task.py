@@ -1,16 +1,55 @@
-from typing import Dict, Any, Optional, List
+from datetime import date
+from typing import Dict, Any, Optional, List, Union
 
+import pandas as pd
 from prefect import task
 
-from src.interface.common.utils import _load_to_mysql
+from src.interface.common.async_db import run_in_db_executor
+from src.interface.common.batch import TransactionBatch
+from src.interface.common.ids import TransactionIdCache
+from src.interface.common.running_totals import get_affected_months, refresh_affected_mtd_running_totals
+from src.interface.common.utils import _load_to_mysql, get_logger, get_watermark, set_watermark, \
+    get_watermark_from_max_dates
 
 
 @task()
 async def async_load_to_mysql(data: Optional[List[Dict[str, Any]]], mysql_param: Dict[str, str], table_name: str):
-    _load_to_mysql(data, mysql_param, table_name)
+    await run_in_db_executor(_load_to_mysql, data, mysql_param, table_name)
 
 
 @task()
 def load_to_mysql(data: Optional[List[Dict[str, Any]]], mysql_param: Dict[str, str], table_name: str,
                   fields_to_update: Optional[List[str]] = None, identifier: Optional[str] = None):
-    _load_to_mysql(data, mysql_param, table_name, fields_to_update, identifier)
+    result = _load_to_mysql(data, mysql_param, table_name, fields_to_update, identifier)
+    if result and (logger := get_logger()):
+        logger.info(f"upserted {fields_to_update} into {table_name}: {result.dict()}")
+
+
+@task()
+def get_account_watermark(mysql_param: Dict[str, str], source: str, account_key: str,
+                          account_numbers: Optional[List[str]] = None) -> Optional[date]:
+    return get_watermark(mysql_param, source, account_key, account_numbers)
+
+
+@task()
+def update_account_watermark(mysql_param: Dict[str, str], source: str, account_key: str,
+                             max_dates: Dict[str, str]):
+    if watermark_date := get_watermark_from_max_dates(max_dates):
+        set_watermark(mysql_param, source, account_key, watermark_date)
+
+
+@task()
+def cache_loaded_transaction_ids(data: TransactionBatch):
+    if len(data):
+        id_cache = TransactionIdCache()
+        id_cache.add(data.frame['id'])
+        id_cache.close()
+
+
+@task()
+def refresh_mtd_running_totals_task(mysql_param: Dict[str, str], data: Union[TransactionBatch, pd.DataFrame],
+                                    date_field: str = 'date'):
+    if affected := get_affected_months(data, date_field=date_field):
+        refreshed = refresh_affected_mtd_running_totals(mysql_param, affected)
+        if logger := get_logger():
+            logger.info(f"refreshed month to date running totals: {refreshed}")
@@ -1,5 +1,9 @@
 bank_flows = [
     "flows/collection/otsar_hahayal_flow.py:scrape_otsar_hahayal",
+    "flows/collection/otsar_hahayal_flow.py:migrate_otsar_transaction_ids",
     "flows/collection/isracard_flow.py:scrape_isracard",
-    "flows/collection/isracard_flow.py:backfill_isracard"
+    "flows/collection/isracard_flow.py:backfill_isracard",
+    "flows/collection/collect_all_flow.py:collect_all_accounts",
+    "flows/collection/replay_archive_flow.py:replay_raw_archive",
+    "flows/collection/migrate_schema_flow.py:migrate_transaction_schema_flow"
 ]
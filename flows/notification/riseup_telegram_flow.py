@@ -9,7 +9,11 @@ from prefect import flow, task
 from flows.common.tasks.mysql_task import async_load_to_mysql
 from src.core.common import async_get_db_secrets
 from src.core.notification.categorization import THEME_CATEGORY, categorize_by_account_number, HighLevelCategories
-from src.interface.common.utils import get_mysql_client, get_today
+from src.interface import MTD_RUNNING_TOTALS_TABLE_NAME
+from src.interface.common.async_db import get_async_mysql_client, run_in_db_executor
+from src.interface.common.running_totals import refresh_mtd_running_totals, create_mtd_running_totals_table, \
+    get_missing_mtd_accounts
+from src.interface.common.utils import get_today
 from src.interface.notification.telegram import send_monthly_progress_to_telegram, enrich_with_more_details
 
 sys.path.append("../../src/core")
@@ -25,26 +29,31 @@ async def get_flow_db_secrets() -> Dict[str, str]:
 @task()
 async def fetch_month_to_date_aggregated_snapshot(cred: Dict[str, Any], start_date: str,
                                                   table_name: str) -> pd.DataFrame:
-    db = get_mysql_client(cred)
+    """
+    Running totals of the month of `start_date`. `start_date` only selects the month: the totals cover every
+    transaction loaded for it, also those after `start_date`.
+    Accounts with expenses but no totals (the first run of the month or of the table) are built here once.
+    """
+    yearmonth = start_date[:7]
+    db = get_async_mysql_client(cred)
     query = f"""
-        SELECT datetime, category, category_id, account_number, month_to_date_expense 
-            FROM {table_name} yt
-            WHERE (account_number, category, datetime) IN (
-              SELECT account_number, category, MAX(datetime) as max_datetime
-              FROM {table_name}
-              WHERE datetime BETWEEN DATE_FORMAT(NOW(), '%%Y-%%m-01') AND '{start_date}'
-              GROUP BY account_number, category
-            )
-            ORDER BY account_number, category, datetime;
+        SELECT category, category_id, account_number, month_to_date_expense
+            FROM {table_name}
+            WHERE yearmonth = %s
+            ORDER BY account_number, category_id;
     """
-    df = pd.read_sql(query, db)
+    await run_in_db_executor(create_mtd_running_totals_table, cred)
+    missing = await run_in_db_executor(get_missing_mtd_accounts, cred, yearmonth)
+    if missing:
+        await run_in_db_executor(refresh_mtd_running_totals, cred, yearmonth, missing)
+    df = await db.read_sql(query, params=(yearmonth,))
     df["datetime"] = start_date
     return df
 
 
 @task()
 async def fetch_month_to_date_raw_data(cred: Dict[str, Any], start_date: str, table_name: str) -> pd.DataFrame:
-    db = get_mysql_client(cred)
+    db = get_async_mysql_client(cred)
     query = f"""
     SELECT date
         , charged
@@ -57,7 +66,7 @@ async def fetch_month_to_date_raw_data(cred: Dict[str, Any], start_date: str, ta
     and transaction_type = 'expense'
     ORDER BY date desc, category, account_number;
     """
-    df = pd.read_sql(query, db)
+    df = await db.read_sql(query)
     return df
 
 
@@ -104,9 +113,10 @@ async def riseup_telegram_flow(start_time: str = None
     }
     credentials = await get_flow_db_secrets()
     start_time = get_today() if not start_time else start_time
-    snapshot = await fetch_month_to_date_aggregated_snapshot(credentials, start_date=start_time,
-                                                             table_name="mart_mtd_expenses")
-    raw_data = await fetch_month_to_date_raw_data(credentials, start_date=start_time, table_name="clean_transactions")
+    snapshot, raw_data = await asyncio.gather(
+        fetch_month_to_date_aggregated_snapshot(credentials, start_date=start_time,
+                                                table_name=MTD_RUNNING_TOTALS_TABLE_NAME),
+        fetch_month_to_date_raw_data(credentials, start_date=start_time, table_name="clean_transactions"))
     prep_snapshot, prep_data = await transform_month_to_date_data(snapshot, raw_data, monthly_limit)
     # await async_load_to_mysql(prep_snapshot, credentials, "mtd_snapshot")
     await send_monthly_progress_to_telegram(prep_snapshot)
@@ -1,18 +1,18 @@
 import json
-from typing import Optional, Tuple, Dict, Any, Callable, List
+from typing import Optional, Tuple, Dict, Any, Callable, List, Iterator
 
 import pandas as pd
 from clearml import Task
 from omegaconf import OmegaConf
 from prefect import flow, task
 
-from flows.common.tasks.mysql_task import load_to_mysql
+from flows.common.tasks.mysql_task import load_to_mysql, refresh_mtd_running_totals_task
 from flows.common.tasks.transform_task import preprocess_task
 from src.core.common import get_db_secrets, get_date_range
 from src.core.prediction.domain_rules import CLASS_2_CLASS_MAP
 from src.core.prediction.model import CategoryModelOutput, BaseDomainRule
-from src.interface.common.utils import get_mysql_client
-from src.interface.prediction.constants import CATEGORY_MODEL_CONFIG_PATH
+from src.interface.common.utils import read_sql_batches, DEFAULT_READ_MEMORY_BUDGET_MB
+from src.interface.prediction.constants import CATEGORY_MODEL_CONFIG_PATH, TRANSACTION_DTYPES
 from src.interface.prediction.entities.clearml_model_registry import ClearMLModelRegistry
 from src.interface.prediction.models import CategoryCatboost
 from src.interface.prediction.process import load_preprocess_config
@@ -24,17 +24,16 @@ PREDICTION_MYSQL_TABLE = "prediction_category"
 DEFAULT_MODEL_TYPE = "CategoryCatboost"
 
 
-@task()
-def load_data_to_predict(cred: Dict[str, Any], date_range: Tuple[str, str], table_name: str) -> pd.DataFrame:
+def load_data_to_predict(cred: Dict[str, Any], date_range: Tuple[str, str], table_name: str,
+                         memory_budget_mb: float = DEFAULT_READ_MEMORY_BUDGET_MB) -> Iterator[pd.DataFrame]:
     """
-    Load data to predict.
-    return: A dataframe with data to predict
+    Load data to predict, streamed in typed batches of at most `memory_budget_mb`.
+    return: An iterator of dataframes with data to predict
     """
     start_date, end_date = date_range
-    table_name = table_name
-    db = get_mysql_client(cred)
     query = f"""
         select t.id
+        , t.date
         , t.processed_date
         , t.charged_amount
         , t.description
@@ -44,8 +43,7 @@ def load_data_to_predict(cred: Dict[str, Any], date_range: Tuple[str, str], tabl
         WHERE
             date BETWEEN '{start_date}' AND '{end_date}'
     """
-    df = pd.read_sql(query, db)
-    return df
+    return read_sql_batches(cred, query, TRANSACTION_DTYPES, memory_budget_mb)
 
 
 @task()
@@ -108,16 +106,19 @@ def post_process(prediction: pd.DataFrame, features: pd.DataFrame, data: pd.Data
 
 
 @flow()
-def run_category_classification(start_date: str = None, moth_in_future_to_predict: int = 1):
+def run_category_classification(start_date: str = None, moth_in_future_to_predict: int = 1,
+                                memory_budget_mb: float = DEFAULT_READ_MEMORY_BUDGET_MB):
     db_secrets = get_db_secrets()
     start_to_end_date = get_date_range(start_date=start_date, month_future_to_predict=moth_in_future_to_predict)
-    df = load_data_to_predict(cred=db_secrets, date_range=start_to_end_date, table_name=MYSQL_TABLE_NAME)
     model = load_latest_model()
     pipe = load_latest_pipeline()
-    preprocess_data = pipe(df, model)
-    prediction = predict(preprocess_data, model)
-    model_output = post_process(prediction, preprocess_data, df)
-    load_to_mysql(model_output, db_secrets, PREDICTION_MYSQL_TABLE)
+    for df in load_data_to_predict(cred=db_secrets, date_range=start_to_end_date, table_name=MYSQL_TABLE_NAME,
+                                   memory_budget_mb=memory_budget_mb):
+        preprocess_data = pipe(df, model)
+        prediction = predict(preprocess_data, model)
+        model_output = post_process(prediction, preprocess_data, df)
+        load_to_mysql(model_output, db_secrets, PREDICTION_MYSQL_TABLE)
+        refresh_mtd_running_totals_task(db_secrets, df)
 
 
 if __name__ == '__main__':
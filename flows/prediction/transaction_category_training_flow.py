@@ -11,9 +11,10 @@ from sklearn.metrics import confusion_matrix, classification_report
 
 from src.core.common import get_db_secrets, get_date_range, set_db_secrets_as_env_variables, hash_dataframe
 from src.core.prediction.model import DataSetManager
-from src.interface.common.utils import get_mysql_client, get_logger
+from src.interface.common.utils import get_mysql_client, get_logger, read_sql_batches, concat_batches, \
+    DEFAULT_READ_MEMORY_BUDGET_MB
 from src.interface.prediction.constants import CATEGORY_MODEL_CONFIG_PATH, \
-    BASE_MODEL_STORAGE_BUCKET_PATH
+    BASE_MODEL_STORAGE_BUCKET_PATH, TRANSACTION_DTYPES
 from flows.common.tasks.transform_task import preprocess_task
 from src.interface.prediction.entities.clearml_dataset_manager import ClearMLDataSetManager
 from src.interface.prediction.entities.clearml_model_registry import ClearMLModelRegistry
@@ -81,6 +82,7 @@ def load_data_to_predict(cred: Optional[Dict[str, str]] = None
                          , date_range: Optional[Tuple[str, str]] = None
                          , datamanager: Optional[ClearMLDataSetManager] = None
                          , limit: Optional[bool] = None
+                         , memory_budget_mb: float = DEFAULT_READ_MEMORY_BUDGET_MB
                          , **kwargs) -> pd.DataFrame:
     logger = get_logger()
     if dataset_id := kwargs.get('dataset_id'):
@@ -88,7 +90,6 @@ def load_data_to_predict(cred: Optional[Dict[str, str]] = None
         df = datamanager.read_dataset(dataset_id)
         table_name = "clearml_dataset"
     else:
-        db = get_mysql_client(cred)
         table_name = cred.get('mysql_table_name')
         query = f"""
             select cred.id
@@ -110,7 +111,7 @@ def load_data_to_predict(cred: Optional[Dict[str, str]] = None
         """
         if limit:
             query += f" limit {limit}"
-        df = pd.read_sql(query, db)
+        df = concat_batches(read_sql_batches(cred, query, TRANSACTION_DTYPES, memory_budget_mb))
         datamanager.dataset_id = hash_dataframe(df)
         datamanager.write_dataset(df)
     logger.info(f"Loaded {len(df)} rows from {table_name}")
@@ -0,0 +1,8 @@
+{% macro affected_months_filter(column='datetime') %}
+{#- months from the last loaded one minus `mtd_lookback_months`, for late-posted and recategorised transactions -#}
+{{ column }} >= (
+    select coalesce(date_format(date_sub(max(datetime), interval {{ var('mtd_lookback_months', 1) }} month),
+                                '%Y-%m-01'), '1900-01-01')
+    from {{ this }}
+)
+{% endmacro %}
@@ -1,8 +1,20 @@
+{{ config(
+    materialized='incremental',
+    unique_key='yearmonth',
+    post_hook="{% if not is_incremental() %}
+        create unique index ux_int_daily_expenses on {{ this }} (datetime, account_number, category_id)
+    {% endif %}"
+) }}
+
 SELECT datetime,
+       date_format(datetime, '%Y-%m') AS yearmonth,
        category_id,
        account_number,
        max(category) as category,
        SUM(charged) AS daily_expense
 FROM {{ref('stg_expense_transaction')}}
+{% if is_incremental() %}
+WHERE {{ affected_months_filter() }}
+{% endif %}
 GROUP BY
-    account_number , datetime, category_id
\ No newline at end of file
+    account_number , datetime, category_id
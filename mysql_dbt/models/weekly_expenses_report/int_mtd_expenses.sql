@@ -1,14 +1,23 @@
+{{ config(
+    materialized='incremental',
+    unique_key='yearmonth',
+    post_hook="{% if not is_incremental() %}
+        create unique index ux_int_mtd_expenses on {{ this }} (datetime, account_number, category_id)
+    {% endif %}"
+) }}
+
+-- closed months never change, only the affected months are recomputed and replaced (unique_key yearmonth)
 SELECT de.datetime,
+       de.yearmonth,
        de.category,
        de.category_id,
        de.account_number,
        SUM(de.daily_expense) OVER (
-            PARTITION BY de.category_id, de.account_number, fdom.yearmonth
+            PARTITION BY de.category_id, de.account_number, de.yearmonth
             ORDER BY de.datetime
             ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
         ) AS month_to_date_expense
 FROM {{ref('int_daily_expenses')}} de
-         JOIN
-     {{ref('int_first_day_of_month')}} fdom
-     ON
-         de.datetime = fdom.datetime
\ No newline at end of file
+{% if is_incremental() %}
+WHERE {{ affected_months_filter('de.datetime') }}
+{% endif %}
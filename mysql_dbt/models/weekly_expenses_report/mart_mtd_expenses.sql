@@ -1,6 +1,23 @@
+{{ config(
+    materialized='incremental',
+    unique_key='yearmonth',
+    post_hook=[
+        "{% if not is_incremental() %}
+            create unique index ux_mart_mtd_expenses on {{ this }} (datetime, account_number, category_id)
+        {% endif %}",
+        "{% if not is_incremental() %}
+            create index ix_mart_mtd_expenses_account_category on {{ this }} (account_number, category, datetime)
+        {% endif %}"
+    ]
+) }}
+
 select datetime,
+       yearmonth,
        category,
        category_id,
        account_number,
        month_to_date_expense
 from {{ref('int_mtd_expenses')}}
+{% if is_incremental() %}
+where {{ affected_months_filter() }}
+{% endif %}
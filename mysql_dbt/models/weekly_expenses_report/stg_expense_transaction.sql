@@ -1,3 +1,8 @@
+{{ config(
+    materialized='table',
+    post_hook="create index ix_stg_expense_transaction_datetime on {{ this }} (datetime)"
+) }}
+
 select date_format(date, '%Y-%m-%d') as datetime,
        category,
        category_id,
@@ -7,4 +12,4 @@ select date_format(date, '%Y-%m-%d') as datetime,
 from {{ source('mysql_db', 'clean_transactions') }}
 where transaction_type = 'expense'
     and category_id not in (41, 47)  -- investment or ignore
-   or category_id is null
\ No newline at end of file
+   or category_id is null
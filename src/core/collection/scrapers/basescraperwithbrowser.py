@@ -1,31 +1,92 @@
 import asyncio
 from abc import abstractmethod
-from datetime import datetime, timedelta
-from typing import Any, Optional, List
+from datetime import datetime, timedelta, date
+from typing import Any, Optional, List, Union, Iterable, Dict
 from src.core.common import DATE_FORMAT
 
 from dateutil.relativedelta import relativedelta
-from pyppeteer import launch
-from pyppeteer.browser import Browser
+from pyppeteer.browser import Browser, BrowserContext
 from pyppeteer.errors import PageError
 from pyppeteer.page import Page
 
 from src.core.collection.scrapers.basescraper import BaseScraper, VIEWPORT_WIDTH, VIEWPORT_HEIGHT, logger, click_button, \
-    wait_until_element_found, fill_input, DATE_FORMAT
+    wait_until_element_found, fill_input
+from src.core.collection.scrapers.browser_manager import BrowserManager, get_browser_manager
+from src.core.collection.scrapers.interception import RequestInterceptor, InterceptionStats, \
+    DEFAULT_BLOCKED_URL_PATTERNS
 from src.core.collection.scrapers.model import LoginOptions, ScraperLoginResult, ScaperProgressTypes, HttpStatusTypes
 from src.core.collection.model import ScraperCredentials
 
+DEFAULT_MAX_CONCURRENT_MONTHS = 3
+DEFAULT_MONTH_RETRIES = 2
+DEFAULT_MONTH_RETRY_DELAY_SECONDS = 2
+
 
 class BaseScraperWithBrowser(BaseScraper):
-    browser: Browser
-    page: Page
+    browser_context: Optional[Union[BrowserContext, Browser]] = None
+    page: Optional[Page] = None
+    interceptor: Optional[RequestInterceptor] = None
+    # per-scraper interception lists, extended by the `blocked_url_patterns`/`allowed_url_patterns` options
+    blocked_url_patterns: Iterable[str] = ()
+    allowed_url_patterns: Iterable[str] = ()
+    blocked_resource_types: Optional[Iterable[str]] = None
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        # billing months of the last fetch that still failed after their retries
+        self.failed_months: List[date] = []
+
+    @property
+    def browser_manager(self) -> BrowserManager:
+        return self.options.get('browser_manager') or get_browser_manager()
 
     async def setup_session(self):
-        self.browser = await launch(headless=True
-                                    , ignoreDefaultArgs=['--enable-automation']
-                                    , dumpio=True
-                                    )
-        self.page = await self.browser.newPage()
+        """
+        Open a page in a context of the process-wide browser. Idempotent, a scraper holds a single session.
+        Pages open in the default context, whose persistent user data dir keeps the disk cache warm across runs.
+        Pass `isolated_context=True` for an incognito context, e.g. for concurrent logins to the same site.
+        """
+        if self.page is not None:
+            return
+        self.browser_context = await self.browser_manager.new_context(
+            isolated=self.options.get('isolated_context', False))
+        self.page = await self.browser_context.newPage()
+        await self.page.setViewport(self.get_view_port)
+        if self.options.get('block_resources', True):
+            self.interceptor = self.get_request_interceptor()
+            await self.interceptor.attach(self.page)
+
+    def get_request_interceptor(self) -> RequestInterceptor:
+        blocked_url_patterns = [*DEFAULT_BLOCKED_URL_PATTERNS, *self.blocked_url_patterns,
+                                *self.options.get('blocked_url_patterns', [])]
+        allowed_url_patterns = [*self.allowed_url_patterns, *self.options.get('allowed_url_patterns', [])]
+        blocked_resource_types = self.options.get('blocked_resource_types', self.blocked_resource_types)
+        return RequestInterceptor(blocked_resource_types=blocked_resource_types,
+                                  blocked_url_patterns=blocked_url_patterns,
+                                  allowed_url_patterns=allowed_url_patterns)
+
+    @property
+    def interception_stats(self) -> Optional[InterceptionStats]:
+        return self.interceptor.stats if self.interceptor else None
+
+    async def terminate(self):
+        logger.info(ScaperProgressTypes.terminating)
+        if self.interceptor:
+            logger.info(f"request interception stats {self.interceptor.stats.dict()}")
+        if self.page is not None and self.browser_manager.is_running and \
+                not isinstance(self.browser_context, BrowserContext):
+            # pages of the shared default context are closed one by one
+            await self.page.close()
+        await self.browser_manager.release_context(self.browser_context)
+        self.page = None
+        self.browser_context = None
+
+    async def __aenter__(self):
+        await self.setup_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.terminate()
 
     @property
     def get_view_port(self):
@@ -132,6 +193,47 @@ class BaseScraperWithBrowser(BaseScraper):
                 raise AttributeError("login_option fields is not valid")
             await fill_input(page, field['selector'], field['value'])
 
+    async def export_session(self) -> Dict[str, Any]:
+        cookies = await self.page.cookies()
+        local_storage = await self.page.evaluate('() => Object.assign({}, window.localStorage)')
+        return dict(cookies=cookies, local_storage=local_storage, url=self.page.url)
+
+    async def import_session(self, session: Dict[str, Any]):
+        """
+        Restore cookies before navigating to the session url, local storage can only be set on its origin
+        """
+        if session.get('cookies'):
+            await self.page.setCookie(*session['cookies'])
+        await self.navigate_to(session['url'])
+        if session.get('local_storage'):
+            page_request_js = """(items) => Object.entries(items).forEach(
+                ([key, value]) => window.localStorage.setItem(key, value))"""
+            await self.page.evaluate(page_request_js, session['local_storage'])
+
+    async def restore_session(self) -> bool:
+        """
+        Restore the stored session of `session_name` and validate it with `is_session_valid`
+        return: True when the restored session is logged in and login can be skipped
+        """
+        session_store, session_name = self.options.get('session_store'), self.options.get('session_name')
+        if not session_store or not session_name or not (session := session_store.load(session_name)):
+            return False
+        await self.import_session(session)
+        if await self.is_session_valid():
+            logger.info(f"restored session {session_name}, skipping login")
+            return True
+        logger.info(f"stored session {session_name} is no longer valid")
+        session_store.delete(session_name)
+        return False
+
+    async def persist_session(self):
+        session_store, session_name = self.options.get('session_store'), self.options.get('session_name')
+        if session_store and session_name:
+            session_store.save(session_name, await self.export_session())
+
+    async def is_session_valid(self) -> bool:
+        return False
+
     async def navigate_to(self, url: str, page: Optional[Page] = None, timeout: Optional[int] = None):
         page = page if not self.page else self.page
         if not page:
@@ -148,13 +250,38 @@ class BaseScraperWithBrowser(BaseScraper):
         self.options.update({**extra_options})
         return await self.fetch_all_transactions(self.page, start_date)
 
-    async def fetch_all_transactions(self, page: Page, start_date: datetime.date):
-        future_moths_to_scrape = self._get_list_of_end_dates(start_date, self.options.get("future_months_to_scrape", 1))
-        loop = asyncio.get_event_loop()
+    async def fetch_all_transactions(self, page: Page, start_date: datetime.date) -> List[Dict[str, Any]]:
+        """
+        Fetch the billing months with at most `max_concurrent_months` in flight, retrying a failed month with
+        exponential backoff. Months that still fail are kept in `failed_months`, they fail the fetch unless
+        `allow_partial_results` is set, in which case they count as months without transactions.
+        return: The processed transactions of each month
+        """
+        end_months = list(dict.fromkeys(
+            self._get_list_of_end_dates(start_date, self.options.get("future_months_to_scrape", 1))))
+        semaphore = asyncio.Semaphore(self.options.get('max_concurrent_months', DEFAULT_MAX_CONCURRENT_MONTHS))
+        self.failed_months = []
         fetched_and_gathered = await asyncio.gather(
-            *(self.fetch_and_process_transaction(page, start_date, end_month) for end_month in future_moths_to_scrape),
-            loop=loop)
-        return fetched_and_gathered
+            *(self._fetch_month(semaphore, page, start_date, end_month) for end_month in end_months))
+        if self.failed_months and not self.options.get('allow_partial_results', False):
+            raise ConnectionError(f"failed to fetch months {[str(m) for m in sorted(self.failed_months)]}")
+        return [transactions or {} for transactions in fetched_and_gathered]
+
+    async def _fetch_month(self, semaphore: asyncio.Semaphore, page: Page, start_date: datetime.date,
+                           end_month: datetime.date) -> Optional[Dict[str, Any]]:
+        retries = self.options.get('month_retries', DEFAULT_MONTH_RETRIES)
+        retry_delay = self.options.get('month_retry_delay_seconds', DEFAULT_MONTH_RETRY_DELAY_SECONDS)
+        for attempt in range(retries + 1):
+            try:
+                async with semaphore:
+                    return await self.fetch_and_process_transaction(page, start_date, end_month)
+            except Exception as e:
+                if attempt == retries:
+                    logger.warning(f"giving up on month {end_month} after {retries + 1} attempts: {e}")
+                    self.failed_months.append(end_month)
+                    return None
+                # the backoff sleeps outside of the semaphore so other months can use the slot
+                await asyncio.sleep(retry_delay * 2 ** attempt)
 
     def _get_list_of_end_dates(self, start_date: datetime, max_dates: int) -> List[datetime]:
         return [start_date + relativedelta(months=_m) for _m in range(1, max_dates + 1)]
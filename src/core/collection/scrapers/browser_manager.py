@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Dict, Any, Set, Union
+
+from pyppeteer import launch
+from pyppeteer.browser import Browser, BrowserContext
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_DATA_DIR = str(Path.home() / ".cache" / "finance_manager" / "chromium")
+
+
+class BrowserManager():
+    """
+    Owns a single headless chromium per process and hands out browser contexts to scrapers.
+    Isolated (incognito) contexts share the browser process but not cookies or storage. The persistent user data dir
+    keeps chromium's disk caches warm between runs for the default context.
+    """
+
+    def __init__(self, user_data_dir: Optional[str] = DEFAULT_USER_DATA_DIR, **launch_options):
+        self.user_data_dir = user_data_dir
+        self.launch_options = dict(headless=True, ignoreDefaultArgs=['--enable-automation'], dumpio=False)
+        self.launch_options.update(launch_options)
+        if executable_path := os.getenv('PUPPETEER_EXECUTABLE_PATH'):
+            self.launch_options.setdefault('executablePath', executable_path)
+        self._browser: Optional[Browser] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._contexts: Set[BrowserContext] = set()
+        self.launch_count = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._browser is not None and self._loop is asyncio.get_event_loop()
+
+    def _kill_stale_browser(self):
+        # a browser launched on another (closed) event loop can't be awaited anymore
+        if self._browser is not None and self._browser.process:
+            self._browser.process.kill()
+        self._browser = None
+        self._contexts.clear()
+
+    async def get_browser(self) -> Browser:
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            self._kill_stale_browser()
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._browser is None:
+                options = dict(self.launch_options)
+                if self.user_data_dir:
+                    Path(self.user_data_dir).mkdir(parents=True, exist_ok=True)
+                    options['userDataDir'] = self.user_data_dir
+                self._browser = await launch(**options)
+                self._browser.on('disconnected', self._on_disconnected)
+                self.launch_count += 1
+                logger.debug(f"launched shared chromium (launch #{self.launch_count})")
+            return self._browser
+
+    def _on_disconnected(self, *args):
+        self._browser = None
+        self._contexts.clear()
+
+    async def new_context(self, isolated: bool = True) -> Union[BrowserContext, Browser]:
+        browser = await self.get_browser()
+        if not isolated:
+            return browser
+        context = await browser.createIncognitoBrowserContext()
+        self._contexts.add(context)
+        return context
+
+    async def release_context(self, context: Union[BrowserContext, Browser, None]):
+        if context is None or context is self._browser:
+            return
+        self._contexts.discard(context)
+        if not self.is_running:
+            return
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug(f"failed closing browser context: {e}")
+
+    async def close(self):
+        for context in list(self._contexts):
+            await self.release_context(context)
+        if self._browser is not None and self.is_running:
+            browser, self._browser = self._browser, None
+            await browser.close()
+        else:
+            self._kill_stale_browser()
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(running=self._browser is not None, launch_count=self.launch_count,
+                    open_contexts=len(self._contexts), user_data_dir=self.user_data_dir)
+
+
+_BROWSER_MANAGER: Optional[BrowserManager] = None
+
+
+def get_browser_manager() -> BrowserManager:
+    global _BROWSER_MANAGER
+    if _BROWSER_MANAGER is None:
+        _BROWSER_MANAGER = BrowserManager()
+    return _BROWSER_MANAGER
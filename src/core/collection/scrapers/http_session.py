@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from email.utils import formatdate
+from http.cookies import Morsel
+from typing import Dict, Any, Optional, List
+
+import aiohttp
+from pyppeteer.page import Page
+from yarl import URL
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONNECTIONS = 4
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 30
+
+
+def _to_morsel(cookie: Dict[str, Any]) -> Morsel:
+    morsel = Morsel()
+    morsel.set(cookie['name'], cookie['value'], cookie['value'])
+    # aiohttp treats any domain attribute as a domain cookie (sent to every subdomain), browser host-only
+    # cookies have no leading dot and are left without one, so the jar binds them to their response_url host
+    if cookie.get('domain', '').startswith('.'):
+        morsel['domain'] = cookie['domain']
+    morsel['path'] = cookie.get('path') or '/'
+    if cookie.get('secure'):
+        morsel['secure'] = True
+    if cookie.get('httpOnly'):
+        morsel['httponly'] = True
+    # browser session cookies have expires -1
+    if (expires := cookie.get('expires') or -1) > 0:
+        morsel['expires'] = formatdate(expires, usegmt=True)
+    return morsel
+
+
+def build_cookie_jar(cookies: List[Dict[str, Any]]) -> aiohttp.CookieJar:
+    """
+    Cookie jar of browser (DevTools) cookies, keeping their domain, path, secure and expiry attributes
+    """
+    cookie_jar = aiohttp.CookieJar()
+    for cookie in cookies:
+        host = cookie.get('domain', '').lstrip('.')
+        cookie_jar.update_cookies({cookie['name']: _to_morsel(cookie)},
+                                  response_url=URL.build(scheme='https', host=host))
+    return cookie_jar
+
+
+class ScraperHttpSession():
+    """
+    Pooled keep-alive http session that reuses the cookies and headers of a logged-in browser page,
+    so data requests don't need a DevTools round-trip each.
+    """
+
+    def __init__(self, cookies: List[Dict[str, Any]], headers: Optional[Dict[str, str]] = None,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 timeout: float = DEFAULT_REQUEST_TIMEOUT_SECONDS):
+        self._session = aiohttp.ClientSession(
+            cookie_jar=build_cookie_jar(cookies),
+            headers=headers or {},
+            connector=aiohttp.TCPConnector(limit=max_connections, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=timeout))
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self.request_count = 0
+
+    @classmethod
+    async def from_page(cls, page: Page, **kwargs) -> 'ScraperHttpSession':
+        cookies = await page.cookies()
+        user_agent = await page.evaluate('() => navigator.userAgent')
+        headers = {'User-Agent': user_agent, 'Referer': page.url, 'Accept': 'application/json, text/plain, */*'}
+        return cls(cookies, headers, **kwargs)
+
+    @staticmethod
+    async def _handle_response(response: aiohttp.ClientResponse) -> Optional[Dict[str, Any]]:
+        response.raise_for_status()
+        # no content response
+        if response.status == 204:
+            return None
+        return await response.json(content_type=None)
+
+    async def get_json(self, url: str) -> Optional[Dict[str, Any]]:
+        async with self._semaphore:
+            self.request_count += 1
+            async with self._session.get(url) as response:
+                return await self._handle_response(response)
+
+    async def close(self):
+        if not self._session.closed:
+            await self._session.close()
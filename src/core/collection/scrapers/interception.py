@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import re
+from typing import Optional, Iterable, Dict
+
+from pydantic import BaseModel
+from pyppeteer.network_manager import Request, Response
+from pyppeteer.page import Page
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'media'})
+DEFAULT_BLOCKED_URL_PATTERNS = (
+    r'google-analytics\.com',
+    r'googletagmanager\.com',
+    r'doubleclick\.net',
+    r'connect\.facebook\.net',
+    r'hotjar\.com',
+    r'clarity\.ms',
+    r'newrelic\.com',
+)
+# blocked requests never report a size, so savings are estimated from typical payloads
+ESTIMATED_RESOURCE_BYTES = {
+    'image': 40_000,
+    'font': 60_000,
+    'media': 500_000,
+    'script': 80_000,
+    'stylesheet': 30_000,
+}
+DEFAULT_ESTIMATED_BYTES = 10_000
+
+
+class InterceptionStats(BaseModel):
+    blocked_requests: int = 0
+    allowed_requests: int = 0
+    estimated_bytes_saved: int = 0
+    bytes_loaded: int = 0
+    blocked_by_type: Dict[str, int] = {}
+
+
+class RequestInterceptor():
+    """
+    Aborts requests by resource type or url pattern. Allowed patterns always win over blocked ones.
+    """
+
+    def __init__(self, blocked_resource_types: Optional[Iterable[str]] = None,
+                 blocked_url_patterns: Optional[Iterable[str]] = None,
+                 allowed_url_patterns: Optional[Iterable[str]] = None):
+        self.blocked_resource_types = frozenset(DEFAULT_BLOCKED_RESOURCE_TYPES if blocked_resource_types is None
+                                                else blocked_resource_types)
+        blocked_url_patterns = list(DEFAULT_BLOCKED_URL_PATTERNS if blocked_url_patterns is None
+                                    else blocked_url_patterns)
+        self.blocked_url_regex = re.compile("|".join(blocked_url_patterns)) if blocked_url_patterns else None
+        allowed_url_patterns = list(allowed_url_patterns or [])
+        self.allowed_url_regex = re.compile("|".join(allowed_url_patterns)) if allowed_url_patterns else None
+        self.stats = InterceptionStats()
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if self.allowed_url_regex and self.allowed_url_regex.search(url):
+            return False
+        if resource_type in self.blocked_resource_types:
+            return True
+        return bool(self.blocked_url_regex and self.blocked_url_regex.search(url))
+
+    async def attach(self, page: Page):
+        await page.setRequestInterception(True)
+        page.on('request', lambda request: asyncio.ensure_future(self._handle_request(request)))
+        page.on('response', self._handle_response)
+
+    async def _handle_request(self, request: Request):
+        if self.should_block(request.url, request.resourceType):
+            self.stats.blocked_requests += 1
+            self.stats.blocked_by_type[request.resourceType] = \
+                self.stats.blocked_by_type.get(request.resourceType, 0) + 1
+            self.stats.estimated_bytes_saved += ESTIMATED_RESOURCE_BYTES.get(request.resourceType,
+                                                                             DEFAULT_ESTIMATED_BYTES)
+            logger.debug(f"force abort for request {request.url}")
+            await request.abort()
+        else:
+            self.stats.allowed_requests += 1
+            await request.continue_()
+
+    def _handle_response(self, response: Response):
+        content_length = response.headers.get('content-length')
+        if content_length and content_length.isdigit():
+            self.stats.bytes_loaded += int(content_length)
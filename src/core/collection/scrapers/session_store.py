@@ -0,0 +1,58 @@
+import json
+import logging
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_DIR = str(Path.home() / ".cache" / "finance_manager" / "sessions")
+DEFAULT_SESSION_MAX_AGE = timedelta(hours=12)
+SESSION_KEY_ENV_VAR = 'SCRAPER_SESSION_KEY'
+
+
+class EncryptedSessionStore():
+    """
+    Fernet-encrypted browser sessions (cookies and local storage) on disk, one file per credential block name.
+    The key is read from the SCRAPER_SESSION_KEY env var, create one with `Fernet.generate_key()`.
+    """
+
+    def __init__(self, directory: str = DEFAULT_SESSION_DIR, key: Optional[str] = None,
+                 max_age: timedelta = DEFAULT_SESSION_MAX_AGE):
+        key = key or os.getenv(SESSION_KEY_ENV_VAR)
+        if not key:
+            raise EnvironmentError(f'{SESSION_KEY_ENV_VAR} must be set to persist scraper sessions')
+        self.fernet = Fernet(key)
+        self.directory = Path(directory)
+        self.max_age = max_age
+
+    def _path(self, name: str) -> Path:
+        return self.directory / f"{re.sub('[^A-Za-z0-9_-]', '_', name)}.session"
+
+    def save(self, name: str, session: Dict[str, Any]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(name)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_bytes(self.fernet.encrypt(json.dumps(session).encode('utf-8')))
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        path = self._path(name)
+        if not path.exists():
+            return None
+        try:
+            token = self.fernet.decrypt(path.read_bytes(), ttl=int(self.max_age.total_seconds()))
+        except InvalidToken:
+            # expired or encrypted with another key
+            logger.info(f"stored session {name} is expired or unreadable")
+            self.delete(name)
+            return None
+        return json.loads(token)
+
+    def delete(self, name: str):
+        self._path(name).unlink(missing_ok=True)
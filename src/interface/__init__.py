@@ -2,7 +2,18 @@ from pathlib import Path
 
 IBS_OTSAR_PATH = "collection/otsar_hahayal/fetch_otsar_hahayal.js"
 IBS_ISRACARD_PATH = "collection/isracard/fetch_isracard.js"
+IBS_WORKER_PATH = "collection/scraper_worker.js"
 INTERFACE_WORKING_DIR = str(Path(__file__).parent.absolute())
+SCRAPER_PROFILES_DIR = str(Path.home() / ".cache" / "finance_manager" / "profiles")
 
 MONGO_BANK_ACCOUNT_TABLE_NAME = 'bank_account_transactions'
-MONGO_CREDIT_TABLE_NAME = 'credit_transactions'
\ No newline at end of file
+MONGO_CREDIT_TABLE_NAME = 'credit_transactions'
+
+WATERMARK_TABLE_NAME = 'scrape_watermark'
+
+RAW_ARCHIVE_DIR = str(Path.home() / ".cache" / "finance_manager" / "raw_archive")
+BACKFILL_CHECKPOINT_DIR = str(Path.home() / ".cache" / "finance_manager" / "backfill_checkpoints")
+ID_CACHE_PATH = str(Path.home() / ".cache" / "finance_manager" / "transaction_ids.sqlite")
+ID_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+ID_MIGRATION_TABLE_NAME = 'transaction_id_migration'
+MTD_RUNNING_TOTALS_TABLE_NAME = 'mtd_running_totals'
@@ -0,0 +1,171 @@
+import re
+from datetime import date
+from typing import Dict, Any, List, Optional, Iterable
+
+import numpy as np
+
+from src.core.collection.scrapers.constants import SHEKEL_CURRENCY_KEYWORD, ALT_SHEKEL_CURRENCY, SHEKEL_CURRENCY
+from src.core.collection.scrapers.model import Transaction, TransactionTypes, TransactionStatuses, \
+    TransactionInstallments
+from src.interface.collection.isracard.constants import INSTALLMENTS_KEYWORD
+
+INSTALLMENTS_REGEX = re.compile(r'\d+')
+CANCELED_VOUCHER_NUMBER = '000000000'
+
+
+def parse_installments(more_info: Optional[str]) -> Optional[Dict[str, int]]:
+    if not more_info or INSTALLMENTS_KEYWORD not in more_info:
+        return None
+    matches = INSTALLMENTS_REGEX.findall(more_info)
+    if len(matches) < 2:
+        return None
+    return dict(number=int(matches[0]), total=int(matches[1]))
+
+
+class IsracardTransactionBatch():
+    """
+    Columnar view of the parsed transactions of a `CurrentCardTransactions` block.
+    `Transaction` objects are only built by `to_transactions`.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], processed_date: str):
+        self.columns = columns
+        self.processed_date = processed_date
+
+    def __len__(self) -> int:
+        return len(self.columns['identifier'])
+
+    @classmethod
+    def empty(cls, processed_date: str = '') -> 'IsracardTransactionBatch':
+        return cls({k: np.array([], dtype=dtype) for k, dtype in BATCH_DTYPES.items()}, processed_date)
+
+    @classmethod
+    def concat(cls, batches: Iterable['IsracardTransactionBatch']) -> 'IsracardTransactionBatch':
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls.empty()
+        columns = {k: np.concatenate([b.columns[k] for b in batches]) for k in BATCH_DTYPES}
+        return cls(columns, batches[0].processed_date)
+
+    def take(self, mask: np.ndarray) -> 'IsracardTransactionBatch':
+        return IsracardTransactionBatch({k: v[mask] for k, v in self.columns.items()}, self.processed_date)
+
+    def filter_old_transactions(self, start_date: date, combine_installments: bool) -> 'IsracardTransactionBatch':
+        mask = self.columns['date'] >= np.datetime64(start_date, 'D')
+        if combine_installments:
+            is_normal = self.columns['type'] == TransactionTypes.NORMAL.value
+            is_initial_installment = self.columns['installment_number'] == 1
+            mask &= is_normal | is_initial_installment
+        return self.take(mask)
+
+    def to_transactions(self) -> List[Transaction]:
+        c = self.columns
+        dates = np.datetime_as_string(c['date'].astype('datetime64[s]'))
+        res = []
+        for i in range(len(self)):
+            installments = TransactionInstallments(number=int(c['installment_number'][i]),
+                                                   total=int(c['installment_total'][i])) \
+                if c['installment_total'][i] > 0 else None
+            res.append(Transaction(
+                type=c['type'][i],
+                identifier=int(c['identifier'][i]),
+                date=dates[i],
+                processedDate=c['processed_date'][i],
+                originalAmount=float(c['original_amount'][i]),
+                originalCurrency=c['original_currency'][i],
+                chargedAmount=float(c['charged_amount'][i]),
+                description=c['description'][i],
+                memo=c['memo'][i],
+                installments=installments,
+                status=TransactionStatuses.COMPLETED.value,
+            ))
+        return res
+
+
+BATCH_DTYPES = {
+    'identifier': np.int64,
+    'date': 'datetime64[D]',
+    'processed_date': object,
+    'original_amount': np.float64,
+    'original_currency': object,
+    'charged_amount': np.float64,
+    'description': object,
+    'memo': object,
+    'installment_number': np.int64,
+    'installment_total': np.int64,
+    'type': object,
+}
+
+
+def _convert_currencies(currencies: np.ndarray) -> np.ndarray:
+    converted = currencies.copy()
+    # missing currencies stay None instead of becoming the string 'None'
+    present = ~np.equal(currencies, None)
+    uniques, inverse = np.unique(currencies[present].astype(str), return_inverse=True)
+    mapped = np.array([SHEKEL_CURRENCY if c in (SHEKEL_CURRENCY_KEYWORD, ALT_SHEKEL_CURRENCY) else c
+                       for c in uniques], dtype=object)
+    converted[present] = mapped[inverse]
+    return converted
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _parse_day_leading_dates(values: List[str]) -> np.ndarray:
+    """
+    Parse 'dd/mm/yyyy' dates by reordering the characters of the whole column into 'yyyy-mm-dd'
+    return: A datetime64[D] array
+    """
+    strings = np.array(values, dtype=str)
+    chars = strings.view('U1').reshape(-1, strings.dtype.itemsize // 4)
+    if chars.shape[1] != 10 or not ((chars[:, 2] == '/') & (chars[:, 5] == '/') & (chars[:, 9] != '')).all():
+        raise ValueError(f"dates are not in the dd/mm/yyyy format: {values}")
+    iso = np.ascontiguousarray(chars[:, [6, 7, 8, 9, 2, 3, 4, 5, 0, 1]])
+    iso[:, [4, 7]] = '-'
+    return iso.view('U10').ravel().astype('datetime64[D]')
+
+
+def _is_canceled(transaction: Dict[str, Any]) -> bool:
+    return transaction.get('dealSumType') == '1' \
+        or transaction.get('voucherNumberRatz') == CANCELED_VOUCHER_NUMBER \
+        or transaction.get('voucherNumberRatzOutbound') == CANCELED_VOUCHER_NUMBER
+
+
+def parse_transaction_block(transactions: Optional[List[Dict[str, Any]]],
+                            processed_date: str) -> IsracardTransactionBatch:
+    """
+    Parse raw isracard transactions (`txnIsrael` or `txnAbroad`) into a columnar batch in one pass:
+    canceled rows are dropped, outbound/domestic fields are selected per row into plain lists and each column is
+    converted once, without building an intermediate DataFrame.
+    return: An IsracardTransactionBatch
+    """
+    transactions = [t for t in transactions or [] if not _is_canceled(t)]
+    if not transactions:
+        return IsracardTransactionBatch.empty(processed_date)
+
+    suffixes = ['Outbound' if t.get('dealSumOutbound') else '' for t in transactions]
+    installments = [parse_installments(t.get('moreInfo')) for t in transactions]
+    installment_total = np.array([i['total'] if i else 0 for i in installments], dtype=np.int64)
+
+    columns = dict(
+        identifier=np.array([t[f'voucherNumberRatz{s}'] for t, s in zip(transactions, suffixes)], dtype=np.int64),
+        date=_parse_day_leading_dates([t[f'fullPurchaseDate{s}'] for t, s in zip(transactions, suffixes)]),
+        processed_date=np.full(len(transactions), processed_date, dtype=object),
+        original_amount=-np.array([_to_float(t.get(f'dealSum{s}')) for t, s in zip(transactions, suffixes)],
+                                  dtype=np.float64),
+        original_currency=_convert_currencies(np.array([t.get('currencyId') for t in transactions], dtype=object)),
+        charged_amount=-np.array([_to_float(t.get(f'paymentSum{s}')) for t, s in zip(transactions, suffixes)],
+                                 dtype=np.float64),
+        description=np.array([t.get(f'fullSupplierName{s or "Heb"}') for t, s in zip(transactions, suffixes)],
+                             dtype=object),
+        memo=np.array([t.get('moreInfo') or '' for t in transactions], dtype=object),
+        installment_number=np.array([i['number'] if i else 0 for i in installments], dtype=np.int64),
+        installment_total=installment_total,
+        type=np.where(installment_total > 0, TransactionTypes.INSTALLMENTS.value, TransactionTypes.NORMAL.value)
+        .astype(object),
+    )
+    return IsracardTransactionBatch(columns, processed_date)
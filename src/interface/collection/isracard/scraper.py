@@ -1,21 +1,24 @@
+import asyncio
 import logging
-from datetime import datetime
+from datetime import datetime, date
 from typing import Dict, Optional, Any, Tuple, List
-import re
 import urllib.parse
+from dateutil.relativedelta import relativedelta
 from deprecated import deprecated
 
 from pyppeteer.page import Page
 
-from src.core import CreditCardUserCredentials, ScraperCredentials
-from src.core.collection.scrapers.basescraper import fetch_post_within_page, fetch_get_within_page, DATE_FORMAT
+from src.core.collection.model import CreditCardUserCredentials, ScraperCredentials
+from src.core.collection.scrapers.basescraper import fetch_post_within_page, fetch_get_within_page, \
+    DAY_LEADING_DATE_FORMAT, YEAR_LEADING_DATE_FORMAT
 from src.core.collection.scrapers.basescraperwithbrowser import BaseScraperWithBrowser
-from src.core import SHEKEL_CURRENCY_KEYWORD, ALT_SHEKEL_CURRENCY, SHEKEL_CURRENCY
-from src.core import deep_get
-from src.core.collection.scrapers.model import ScaperProgressTypes, ScraperLoginResult, ScraperErrorTypes, Transaction, \
-    TransactionStatuses, \
-    TransactionTypes
-from src.interface.collection.isracard.constants import COUNTRY_CODE, ID_TYPE, INSTALLMENTS_KEYWORD
+from src.core.collection.scrapers.http_session import ScraperHttpSession, DEFAULT_MAX_CONNECTIONS
+from src.core.collection.scrapers.constants import SHEKEL_CURRENCY_KEYWORD, ALT_SHEKEL_CURRENCY, SHEKEL_CURRENCY
+from src.core.collection.scrapers.helpers import deep_get
+from src.core.collection.scrapers.model import ScaperProgressTypes, ScraperLoginResult, ScraperErrorTypes
+from src.interface.collection.isracard.batch_parser import IsracardTransactionBatch, parse_transaction_block, \
+    parse_installments
+from src.interface.collection.isracard.constants import COUNTRY_CODE, ID_TYPE
 
 logger = logging.getLogger(__name__)
 
@@ -24,12 +27,20 @@ class IsracardScraper(BaseScraperWithBrowser):
     base_url: str
     company_code: str
     services_url: str
+    blocked_url_patterns = (r'detector-dom\.min\.js',)
+    http_session: Optional[ScraperHttpSession] = None
 
     def __init__(self, **options):
         super().__init__(**options)
         self.base_url = 'https://digital.isracard.co.il'
         self.company_code = '11'
         self.services_url = f"{self.base_url}/services/ProxyRequestHandler.ashx"
+        self._reset_accounts_cache()
+
+    def _reset_accounts_cache(self):
+        self._accounts_cache: Dict[str, List[Dict[str, Any]]] = {}
+        self._accounts_template: Optional[Tuple[datetime.date, List[Dict[str, Any]]]] = None
+        self._accounts_lock: Optional[asyncio.Lock] = None
 
     @staticmethod
     def _get_change_password_result():
@@ -43,14 +54,7 @@ class IsracardScraper(BaseScraperWithBrowser):
 
     @staticmethod
     def _get_installment_info(transaction: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        if (not transaction.get('moreInfo')) or (INSTALLMENTS_KEYWORD in transaction.get('moreInfo')):
-            return None
-
-        matches = re.match("/\d+/g", transaction.get('moreInfo'))
-        if not matches or len(matches) < 2:
-            return None
-
-        return dict(number=int(matches[0]), total=int(matches[1]))
+        return parse_installments(transaction.get('moreInfo'))
 
     @staticmethod
     def _convert_currency(currency: str):
@@ -109,36 +113,61 @@ class IsracardScraper(BaseScraperWithBrowser):
         return logging_status_code, validation_return_code
 
     async def login(self, credentials: ScraperCredentials) -> ScraperLoginResult:
-        # await self.page.setRequestInterception(True)
-        #   this.page.on('request', (request) => {
-        #     if (request.url().includes('detector-dom.min.js')) {
-        #       debug('force abort for request do download detector-dom.min.js resource');
-        #       request.abort();
-        #     } else {
-        #       request.continue();
-        #     }
-        #   });
-        #
-        logger.info('navigate to login page')
         await self.setup_session()
-        await self.navigate_to(f'{self.base_url}/personalarea/Login')
-        logger.info(ScaperProgressTypes.logging_in)
-
-        id_data_response = await self.validate_user_exists(credentials)
-        logging_status_code, validation_return_code = await self.login_with_username(
-            validated_response=id_data_response, credentials=credentials)
-        login_status = self.get_login_status(logging_status_code, validation_return_code)
-        if not login_status.success:
-            raise ConnectionError(login_status.error_message)
+        if await self.restore_session():
+            login_status = self._get_login_success()
+        else:
+            logger.info('navigate to login page')
+            await self.navigate_to(f'{self.base_url}/personalarea/Login')
+            logger.info(ScaperProgressTypes.logging_in)
+
+            id_data_response = await self.validate_user_exists(credentials)
+            logging_status_code, validation_return_code = await self.login_with_username(
+                validated_response=id_data_response, credentials=credentials)
+            login_status = self.get_login_status(logging_status_code, validation_return_code)
+            if not login_status.success:
+                raise ConnectionError(login_status.error_message)
+            await self.persist_session()
+        if self.options.get('http_client', False):
+            await self.switch_to_http_session()
         return login_status
 
+    async def is_session_valid(self) -> bool:
+        # the dashboard of the current month only answers with status 1 for a logged-in session
+        try:
+            result = await fetch_get_within_page(self.page, self._get_accounts_url(datetime.now().date()))
+        except Exception as e:
+            logger.debug(f"session validation failed: {e}")
+            return False
+        return bool(result) and result.get("Header", {}).get("Status") == '1'
+
+    async def switch_to_http_session(self):
+        """
+        Export the logged-in session to a pooled http client and release the browser, data calls go over http
+        """
+        self.http_session = await ScraperHttpSession.from_page(
+            self.page, max_connections=self.options.get('max_connections', DEFAULT_MAX_CONNECTIONS))
+        await super().terminate()
+
+    async def terminate(self):
+        if self.http_session:
+            await self.http_session.close()
+            self.http_session = None
+        await super().terminate()
+
+    async def _get(self, url: str) -> Optional[Dict[str, Any]]:
+        if self.http_session:
+            return await self.http_session.get_json(url)
+        return await fetch_get_within_page(self.page, url)
+
     async def fetch_data(self):
+        self._reset_accounts_cache()
         result = await super().fetch_data(servicesUrl=self.services_url, companyCode=self.company_code)
         return result
 
     async def fetch_and_process_transaction(self, page: Page, start_date: datetime, end_month: datetime.date) -> Dict[
         str, Any]:
-        accounts = await self.fetch_accounts(end_month)
+        accounts = await self.get_accounts(end_month)
         raw_transactions = await self.fetch_transaction(end_month)
         if not self.valid_transactions(raw_transactions):
             return {}
@@ -157,9 +186,39 @@ class IsracardScraper(BaseScraperWithBrowser):
         logger.info(ScaperProgressTypes.login_failed)
         return ScraperLoginResult(success=False, error_type=ScraperErrorTypes.invalid_password)
 
+    async def get_accounts(self, end_month: datetime.date) -> List[Dict[str, Any]]:
+        """
+        Per-run accounts cache. The card list is fetched once and reused for the other billing months, with the
+        billing day shifted to the requested month (`cache_accounts_across_months=False` fetches every month).
+        """
+        month_key = end_month.strftime('%Y-%m')
+        if self._accounts_lock is None:
+            self._accounts_lock = asyncio.Lock()
+        async with self._accounts_lock:
+            if month_key in self._accounts_cache:
+                return self._accounts_cache[month_key]
+            if self._accounts_template and self.options.get('cache_accounts_across_months', True):
+                accounts = self._shift_accounts_to_month(*self._accounts_template, end_month)
+            else:
+                accounts = await self.fetch_accounts(end_month)
+                if accounts:
+                    self._accounts_template = (end_month, accounts)
+            if accounts:
+                self._accounts_cache[month_key] = accounts
+            return accounts
+
+    @staticmethod
+    def _shift_accounts_to_month(template_month: datetime.date, accounts: List[Dict[str, Any]],
+                                 end_month: datetime.date) -> List[Dict[str, Any]]:
+        months_diff = (end_month.year - template_month.year) * 12 + end_month.month - template_month.month
+        return [{**account,
+                 "processed_date": str(date.fromisoformat(account["processed_date"])
+                                       + relativedelta(months=months_diff))}
+                for account in accounts]
+
     async def fetch_accounts(self, end_month: datetime.date) -> List[Dict[str, Any]]:
         data_url = self._get_accounts_url(end_month)
-        result = await fetch_get_within_page(self.page, data_url)
+        result = await self._get(data_url)
         res_header = result.get("Header", {})
         if result and res_header.get("Status") == '1' and result.get("DashboardMonthBean"):
             cards_charges = result.get("DashboardMonthBean", {}).get('cardsCharges')
@@ -173,10 +232,10 @@ class IsracardScraper(BaseScraperWithBrowser):
         return []
 
     def _parse_billing_date(self, billing_date: Optional[str]) -> str:
-        return str(datetime.strptime(billing_date, DATE_FORMAT).date())
+        return str(datetime.strptime(billing_date, DAY_LEADING_DATE_FORMAT).date())
 
     def _get_accounts_url(self, end_month: datetime.date) -> str:
-        billing_date = datetime.strftime(end_month, DATE_FORMAT)
+        billing_date = datetime.strftime(end_month, YEAR_LEADING_DATE_FORMAT)
         params = {
             "reqName": 'DashboardMonth',
             "actionCode": '0',
@@ -198,7 +257,7 @@ class IsracardScraper(BaseScraperWithBrowser):
 
     async def fetch_transaction(self, end_month: datetime.date):
         data_url = self._get_transaction_url(end_month)
-        return await fetch_get_within_page(self.page, data_url)
+        return await self._get(data_url)
 
     def process_transaction(self, raw_transactions: Dict[str, Any], start_date: datetime.date,
                             accounts: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
@@ -231,20 +290,20 @@ class IsracardScraper(BaseScraperWithBrowser):
         :param accounts:
         :return:
         """
+        combine_installments = self.options.get("combineInstallments", False)
         result = {}
         for account in accounts:
             account_index = str(account.get('index'))
             account_number = str(account.get('account_number'))
             processed_date = str(account.get('processed_date'))
             account_transactions = self._get_account_transaction(raw_transactions, account_index)
-            account_transactions = self._convert_transactions_currency_to_shekels(account_transactions, processed_date)
-            account_transactions = self._filter_old_transactions(account_transactions, start_date,
-                                                                 self.options.get("combineInstallments", False))
+            batch = self._convert_transactions_currency_to_shekels(account_transactions, processed_date)
+            batch = batch.filter_old_transactions(start_date, combine_installments)
             # decided to skip over fixInstallments operation
             result[account_number] = dict(
                 accountNumber=account_number,
                 index=account_index,
-                txns=account_transactions,
+                txns=batch.to_transactions(),
             )
         return result
 
@@ -261,55 +320,10 @@ class IsracardScraper(BaseScraperWithBrowser):
                         "CurrentCardTransactions")
 
     def _convert_transactions_currency_to_shekels(self, account_transactions: List[Dict[str, Any]],
-                                                  processed_date: str) -> List[Transaction]:
+                                                  processed_date: str) -> IsracardTransactionBatch:
         if not account_transactions:
-            return []
-
-        all_transactions = []
-        for transaction in account_transactions:
-            converted_transactions_israel = self._convert_transaction_by_currency(transaction.get("txnIsrael")
-                                                                                  , processed_date)
-            all_transactions += converted_transactions_israel
-            converted_transactions_abroad = self._convert_transaction_by_currency(transaction.get("txnAbroad")
-                                                                                  , processed_date)
-            all_transactions += converted_transactions_abroad
-        return all_transactions
-
-    def _convert_transaction_by_currency(self, transactions: List[Any], processed_date: str):
-        if not transactions:
-            return []
-
-        filtered_transactions = self._filter_transactions(transactions)
-        return self._parse_final_transaction(filtered_transactions, processed_date)
-
-    def _filter_transactions(self, transactions):
-        return [t for t in transactions if t.get('dealSumType', '') != '1'
-                and t.get('voucherNumberRatz', '') != '000000000'
-                and t.get('voucherNumberRatzOutbound', '') != '000000000']
-
-    def _parse_final_transaction(self, filtered_transactions: List[Dict[str, Any]],
-                                 processed_date: str) -> List[Transaction]:
-        res = []
-        for t in filtered_transactions:
-            is_outbound = t.get('dealSumOutbound')
-            txn_date_str = t.get('fullPurchaseDateOutbound') if is_outbound else t.get('fullPurchaseDate')
-            txn_datetime = datetime.strptime(txn_date_str, DATE_FORMAT)
-            built_transaction = Transaction(
-                type=self._get_transaction_type(t),
-                identifier=int(t.get('voucherNumberRatzOutbound') if is_outbound else t.get('voucherNumberRatz')),
-                date=txn_datetime.isoformat(),
-                processedDate=processed_date,
-                originalAmount=-float(t.get('dealSumOutbound')) if is_outbound else -float(t.get('dealSum')),
-                originalCurrency=self._convert_currency(t.get('currencyId')),
-                chargedAmount=-float(t.get('paymentSumOutbound')) if is_outbound else -float(t.get('paymentSum')),
-                description=t.get('fullSupplierNameOutbound') if is_outbound else t.get('fullSupplierNameHeb'),
-                memo=t.get('moreInfo') or '',
-                installments=self._get_installment_info(t) or None,
-                status=TransactionStatuses.COMPLETED.value,
-            )
-            res.append(built_transaction)
-        return res
+            return IsracardTransactionBatch.empty(processed_date)
 
-    def _get_transaction_type(self, transaction: Dict[str, Any]) -> str:
-        return TransactionTypes.INSTALLMENTS.value if self._get_installment_info(
-            transaction) else TransactionTypes.NORMAL.value
+        return IsracardTransactionBatch.concat(
+            parse_transaction_block(transaction.get(block), processed_date)
+            for transaction in account_transactions for block in ("txnIsrael", "txnAbroad"))
@@ -1,5 +1,5 @@
 from src.core.collection.scrapers.basescraperwithbrowser import BaseScraperWithBrowser
-from src.core import ScraperCredentials
+from src.core.collection.model import ScraperCredentials
 from src.core.collection.scrapers.model import ScraperLoginResult
 
 
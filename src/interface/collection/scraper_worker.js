@@ -0,0 +1,103 @@
+import {CompanyTypes, createScraper} from 'israeli-bank-scrapers';
+import * as dotenv from 'dotenv' // see https://github.com/motdotla/dotenv#how-do-i-use-dotenv-with-import
+import puppeteer from 'puppeteer';
+import * as readline from 'readline';
+
+// Long-lived scraper worker. Jobs are read as JSON lines from stdin and answered with one JSON line on stdout:
+//   request  {"id": "...", "companyId": "isracard", "options": {...}, "credentials": {...}}
+//   response {"id": "...", "success": true, "result": {...}, "elapsedMs": 1234}
+// Jobs with "stream": true are answered with one {"type": "txn"} line per transaction and a closing {"type": "end"} line.
+// stdout is reserved for the protocol, everything else goes to stderr.
+console.log = console.error;
+
+const browsers = {};
+
+async function getBrowser(showBrowser, userDataDir) {
+    // a persistent profile keeps cookies (e.g. an approved device) across runs
+    const key = `${showBrowser ? 'headful' : 'headless'}:${userDataDir || ''}`;
+    if (!browsers[key] || !browsers[key].isConnected()) {
+        browsers[key] = await puppeteer.launch({
+            headless: !showBrowser,
+            userDataDir: userDataDir || undefined,
+            executablePath: process.env.PUPPETEER_EXECUTABLE_PATH || undefined,
+        });
+    }
+    return browsers[key];
+}
+
+function writeResponse(response) {
+    process.stdout.write(JSON.stringify(response) + '\n');
+}
+
+async function runJob(job) {
+    const started = Date.now();
+    try {
+        const options = Object.assign({}, job.options || {});
+        options.companyId = CompanyTypes[job.companyId];
+        if (!options.companyId) {
+            throw new Error(`unknown company ${job.companyId}`);
+        }
+        if (options.startDate) {
+            options.startDate = new Date(options.startDate);
+        }
+        options.browser = await getBrowser(options.showBrowser, options.userDataDir);
+        delete options.userDataDir;
+        options.skipCloseBrowser = true;
+
+        const scraper = createScraper(options);
+        const scrapeResult = await scraper.scrape(job.credentials);
+        if (!scrapeResult.success) {
+            throw new Error(scrapeResult.errorType);
+        }
+        if (job.stream) {
+            // one line per transaction so the python side never holds the whole payload as a single string
+            const accounts = [];
+            for (const account of scrapeResult.accounts || []) {
+                for (const txn of account.txns || []) {
+                    writeResponse({id: job.id, type: 'txn', accountNumber: account.accountNumber, txn});
+                }
+                accounts.push({accountNumber: account.accountNumber, balance: account.balance, txnCount: (account.txns || []).length});
+            }
+            writeResponse({id: job.id, type: 'end', success: true, accounts, elapsedMs: Date.now() - started});
+        } else {
+            writeResponse({id: job.id, success: true, result: scrapeResult, elapsedMs: Date.now() - started});
+        }
+    } catch (e) {
+        writeResponse({
+            id: job.id,
+            type: 'end',
+            success: false,
+            error: `scraping failed for the following reason: ${e.message}`,
+            elapsedMs: Date.now() - started
+        });
+    }
+}
+
+async function shutdown() {
+    for (const browser of Object.values(browsers)) {
+        await browser.close().catch(() => {});
+    }
+    process.exit(0);
+}
+
+(async function () {
+    dotenv.config()
+    const rl = readline.createInterface({input: process.stdin, terminal: false});
+    process.on('SIGTERM', shutdown);
+
+    // jobs are handled one at a time, the python pool owns concurrency by running several workers
+    for await (const line of rl) {
+        if (!line.trim()) {
+            continue;
+        }
+        let job;
+        try {
+            job = JSON.parse(line);
+        } catch (e) {
+            writeResponse({id: null, success: false, error: `invalid job: ${e.message}`, elapsedMs: 0});
+            continue;
+        }
+        await runJob(job);
+    }
+    await shutdown();
+})();
@@ -0,0 +1,267 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from subprocess import Popen, PIPE
+from typing import Dict, Any, Optional, List, Generator
+
+from pydantic import BaseModel
+
+from src.interface import IBS_WORKER_PATH, INTERFACE_WORKING_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_JOBS_PER_WORKER = 20
+DEFAULT_JOB_TIMEOUT_SECONDS = 60 * 15
+# stdout lines read ahead of the consumer, a full buffer blocks the reader and, through the pipe, the worker
+DEFAULT_RESPONSE_BUFFER_LINES = 1000
+
+
+class ScraperJobResult(BaseModel):
+    job_id: str
+    success: bool
+    data: Optional[Dict[str, Any]]
+    error: Optional[str]
+    elapsed_ms: float
+    scraper_elapsed_ms: Optional[float]
+    worker_pid: int
+    worker_job_number: int
+
+
+class ScraperWorker():
+    """
+    A single long-lived `node scraper_worker.js` process speaking the json-lines protocol over stdin/stdout
+    """
+
+    def __init__(self, worker_path: str = IBS_WORKER_PATH, cwd: str = INTERFACE_WORKING_DIR,
+                 response_buffer_lines: int = DEFAULT_RESPONSE_BUFFER_LINES):
+        self.process = Popen(["node", worker_path], stdin=PIPE, stdout=PIPE, stderr=PIPE,
+                             universal_newlines=True, bufsize=1, cwd=cwd)
+        self.jobs_done = 0
+        self.started_at = time.monotonic()
+        self._responses = queue.Queue(maxsize=response_buffer_lines)
+        self._stderr_tail = deque(maxlen=50)
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read_stdout(self):
+        for line in self.process.stdout:
+            if line.strip():
+                self._responses.put(line)
+        self._responses.put(None)
+
+    def _read_stderr(self):
+        for line in self.process.stderr:
+            self._stderr_tail.append(line.rstrip())
+
+    def stderr_tail(self) -> str:
+        return "\n".join(self._stderr_tail)
+
+    def _send(self, company_id: str, options: Dict[str, Any], credentials: Dict[str, Any],
+              stream: bool = False) -> str:
+        job_id = uuid.uuid4().hex
+        job = dict(id=job_id, companyId=company_id, options=options, credentials=credentials, stream=stream)
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+        return job_id
+
+    def _next_response(self, job_id: str, deadline: float) -> Dict[str, Any]:
+        while True:
+            try:
+                line = self._responses.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise TimeoutError(f"scraper worker {self.pid} did not answer job {job_id} in time")
+            if line is None:
+                raise ChildProcessError(f"scraper worker {self.pid} exited: {self.stderr_tail()}")
+            response = json.loads(line)
+            if response.get('id') == job_id:
+                return response
+            logger.warning(f"scraper worker {self.pid} dropped a stale response {response.get('id')}")
+
+    def _job_result(self, job_id: str, response: Dict[str, Any], started: float) -> ScraperJobResult:
+        self.jobs_done += 1
+        return ScraperJobResult(job_id=job_id,
+                                success=response.get('success', False),
+                                data=response.get('result'),
+                                error=response.get('error'),
+                                elapsed_ms=(time.monotonic() - started) * 1000,
+                                scraper_elapsed_ms=response.get('elapsedMs'),
+                                worker_pid=self.pid,
+                                worker_job_number=self.jobs_done)
+
+    def run(self, company_id: str, options: Dict[str, Any], credentials: Dict[str, Any],
+            timeout: float = DEFAULT_JOB_TIMEOUT_SECONDS) -> ScraperJobResult:
+        started = time.monotonic()
+        job_id = self._send(company_id, options, credentials)
+        response = self._next_response(job_id, started + timeout)
+        return self._job_result(job_id, response, started)
+
+    def stream(self, company_id: str, options: Dict[str, Any], credentials: Dict[str, Any],
+               timeout: float = DEFAULT_JOB_TIMEOUT_SECONDS) -> Generator[Dict[str, Any], None, ScraperJobResult]:
+        """
+        Run a job in streaming mode
+        return: A generator of flat transactions (with `accountNumber`), returning the job result when exhausted
+        """
+        started = time.monotonic()
+        job_id = self._send(company_id, options, credentials, stream=True)
+        while True:
+            response = self._next_response(job_id, started + timeout)
+            if response.get('type') == 'txn':
+                yield {**response['txn'], 'accountNumber': str(response.get('accountNumber'))}
+                continue
+            result = self._job_result(job_id, response, started)
+            if not result.success:
+                raise ChildProcessError(f'fetching process failed: {result.error}')
+            return result
+
+    def close(self, timeout: float = 10):
+        if not self.is_alive:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=timeout)
+        except Exception:
+            self.process.kill()
+
+
+class ScraperWorkerPool():
+    """
+    Pool of warm scraper workers. Workers are spawned lazily up to `size`, shared across flow runs in the same
+    process and recycled after `max_jobs_per_worker` jobs, a timeout or a crash.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER):
+        if size < 1 or max_jobs_per_worker < 1:
+            raise ValueError("size and max_jobs_per_worker must be positive")
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._idle = queue.LifoQueue()
+        self._slots = threading.Condition()
+        self._busy = 0
+        self._lock = threading.Lock()
+        self._workers: List[ScraperWorker] = []
+        self.job_timings: deque = deque(maxlen=100)
+
+    def _acquire_slot(self):
+        with self._slots:
+            while self._busy >= self.size:
+                self._slots.wait()
+            self._busy += 1
+
+    def _release_slot(self):
+        with self._slots:
+            self._busy -= 1
+            self._slots.notify_all()
+
+    def resize(self, size: int):
+        """
+        Change the number of concurrent jobs. Surplus workers are closed when they are released.
+        """
+        if size < 1:
+            raise ValueError("size must be positive")
+        with self._slots:
+            self.size = size
+            self._slots.notify_all()
+
+    def _acquire_worker(self) -> ScraperWorker:
+        self._acquire_slot()
+        try:
+            worker = self._idle.get_nowait()
+            if worker.is_alive:
+                return worker
+            self._discard(worker)
+        except queue.Empty:
+            pass
+        try:
+            worker = ScraperWorker()
+        except Exception:
+            self._release_slot()
+            raise
+        with self._lock:
+            self._workers.append(worker)
+        logger.info(f"spawned scraper worker {worker.pid}")
+        return worker
+
+    def _release_worker(self, worker: ScraperWorker, healthy: bool):
+        if healthy and worker.is_alive and worker.jobs_done < self.max_jobs_per_worker \
+                and self._idle.qsize() < self.size:
+            self._idle.put(worker)
+        else:
+            logger.info(f"recycling scraper worker {worker.pid} after {worker.jobs_done} jobs")
+            self._discard(worker)
+        self._release_slot()
+
+    def _discard(self, worker: ScraperWorker):
+        worker.close()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+    def run(self, company_id: str, options: Dict[str, Any], credentials: Dict[str, Any],
+            timeout: float = DEFAULT_JOB_TIMEOUT_SECONDS) -> ScraperJobResult:
+        worker = self._acquire_worker()
+        healthy = False
+        try:
+            result = worker.run(company_id, options, credentials, timeout)
+            healthy = True
+        finally:
+            self._release_worker(worker, healthy)
+        self.job_timings.append(dict(job_id=result.job_id, company_id=company_id, success=result.success,
+                                     elapsed_ms=result.elapsed_ms, worker_pid=result.worker_pid))
+        return result
+
+    def stream(self, company_id: str, options: Dict[str, Any], credentials: Dict[str, Any],
+               timeout: float = DEFAULT_JOB_TIMEOUT_SECONDS) -> Generator[Dict[str, Any], None, ScraperJobResult]:
+        worker = self._acquire_worker()
+        healthy = False
+        try:
+            # a consumer that stops early leaves unread lines behind, so the worker is only reused on exhaustion
+            result = yield from worker.stream(company_id, options, credentials, timeout)
+            healthy = True
+        finally:
+            self._release_worker(worker, healthy)
+        self.job_timings.append(dict(job_id=result.job_id, company_id=company_id, success=result.success,
+                                     elapsed_ms=result.elapsed_ms, worker_pid=result.worker_pid))
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            workers = [dict(pid=w.pid, jobs_done=w.jobs_done, alive=w.is_alive) for w in self._workers]
+        return dict(size=self.size, max_jobs_per_worker=self.max_jobs_per_worker, workers=workers,
+                    recent_jobs=list(self.job_timings))
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+
+
+_POOL: Optional[ScraperWorkerPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_scraper_worker_pool(size: Optional[int] = None,
+                            max_jobs_per_worker: int = DEFAULT_MAX_JOBS_PER_WORKER) -> ScraperWorkerPool:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ScraperWorkerPool(size=size or DEFAULT_POOL_SIZE, max_jobs_per_worker=max_jobs_per_worker)
+            atexit.register(_POOL.close)
+        elif size and size != _POOL.size:
+            _POOL.resize(size)
+        return _POOL
@@ -0,0 +1,190 @@
+import json
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterator, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic import BaseModel
+
+from src.interface import RAW_ARCHIVE_DIR
+from src.interface.common.batch import TransactionBatch
+from src.interface.common.running_totals import get_affected_months, refresh_affected_mtd_running_totals
+from src.interface.common.utils import _load_to_mysql, load_transactions_to_mongo
+
+MANIFEST_FILE_NAME = 'manifest.jsonl'
+ARCHIVE_COMPRESSION = 'zstd'
+UNKNOWN_MONTH = 'unknown'
+# sources whose mysql ids are a hash of the transaction (see translate_to_mysql_format)
+CREATE_ID_SOURCES = frozenset({'otsar_hahayal'})
+ARCHIVE_SCHEMA = pa.schema([
+    ('account_number', pa.string()),
+    ('date', pa.string()),
+    ('payload', pa.string()),
+])
+
+
+class ArchiveEntry(BaseModel):
+    path: str
+    source: str
+    account_number: str
+    month: str
+    rows: int
+    min_date: Optional[str]
+    max_date: Optional[str]
+    scraped_at: str
+    size_bytes: int
+
+
+class RawScrapeArchive():
+    """
+    Append-only archive of raw scraped transactions in zstd Parquet files, partitioned as
+    `source=/account=/month=` with a json lines manifest. Transactions are kept as raw json payloads
+    so a change of the scraper or mysql schema never invalidates archived files.
+    """
+
+    def __init__(self, root: str = RAW_ARCHIVE_DIR):
+        self.root = Path(root)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / MANIFEST_FILE_NAME
+
+    def open_writer(self, source: str, scraped_at: Optional[datetime] = None) -> 'ArchiveWriter':
+        return ArchiveWriter(self, source, scraped_at)
+
+    def write(self, source: str, data: Union[List[Dict[str, Any]], Dict[str, Any], TransactionBatch],
+              account_number: str = 'NA', scraped_at: Optional[datetime] = None) -> List[ArchiveEntry]:
+        """
+        Archive one raw scrape, one file per account and transaction month
+        return: The manifest entries of the written files
+        """
+        with self.open_writer(source, scraped_at) as writer:
+            writer.write(data, account_number)
+        return writer.entries
+
+    def _append_to_manifest(self, entries: List[ArchiveEntry]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.writelines(entry.json() + '\n' for entry in entries)
+
+    def iter_entries(self, source: Optional[str] = None, account_number: Optional[str] = None,
+                     start_month: Optional[str] = None, end_month: Optional[str] = None) -> Iterator[ArchiveEntry]:
+        if not self.manifest_path.exists():
+            return
+        with open(self.manifest_path, encoding='utf-8') as f:
+            for line in f:
+                entry = ArchiveEntry.parse_raw(line)
+                if source and entry.source != source:
+                    continue
+                if account_number and entry.account_number != str(account_number):
+                    continue
+                if start_month and entry.month < start_month:
+                    continue
+                if end_month and entry.month > end_month:
+                    continue
+                yield entry
+
+    def read(self, source: str, account_number: Optional[str] = None, start_month: Optional[str] = None,
+             end_month: Optional[str] = None) -> TransactionBatch:
+        """
+        Read archived transactions back, the same transaction archived by overlapping scrapes is read once
+        return: A TransactionBatch of the raw scraped transactions
+        """
+        payloads = {}
+        for entry in self.iter_entries(source, account_number, start_month, end_month):
+            table = pq.read_table(self.root / entry.path, columns=['payload'])
+            payloads.update(dict.fromkeys(table.column('payload').to_pylist()))
+        return TransactionBatch.from_records([json.loads(p) for p in payloads])
+
+
+class ArchiveWriter():
+    """
+    Archive the raw scrapes of one run (e.g. the chunks of a streamed scrape) to a single file per account and
+    transaction month: each `write` appends a row group to the open files, `close` publishes them to the manifest
+    """
+
+    def __init__(self, archive: RawScrapeArchive, source: str, scraped_at: Optional[datetime] = None):
+        self.archive = archive
+        self.source = source
+        self.scraped_at = (scraped_at or datetime.now()).strftime('%Y%m%dT%H%M%S')
+        self.entries: List[ArchiveEntry] = []
+        self._partitions: Dict[tuple, Dict[str, Any]] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, data: Union[List[Dict[str, Any]], Dict[str, Any], TransactionBatch], account_number: str = 'NA'):
+        batch = data if isinstance(data, TransactionBatch) else TransactionBatch.from_scraped(data, account_number)
+        partitions: Dict[tuple, List[Dict[str, Any]]] = {}
+        for document in batch.to_documents():
+            document.pop('_id', None)
+            month = str(document.get('date') or '')[:7] or UNKNOWN_MONTH
+            partitions.setdefault((str(document.get('accountNumber', account_number)), month), []).append(document)
+        for (account, month), documents in partitions.items():
+            self._write_partition(account, month, documents)
+
+    def _write_partition(self, account: str, month: str, documents: List[Dict[str, Any]]):
+        partition = self._partitions.get((account, month))
+        if partition is None:
+            directory = self.archive.root / f"source={self.source}" / f"account={account}" / f"month={month}"
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"part-{self.scraped_at}-{uuid.uuid4().hex[:8]}.parquet"
+            partition = dict(path=path, tmp_path=path.with_suffix('.tmp'), rows=0, dates=set())
+            partition['writer'] = pq.ParquetWriter(partition['tmp_path'], ARCHIVE_SCHEMA,
+                                                   compression=ARCHIVE_COMPRESSION)
+            self._partitions[(account, month)] = partition
+        dates = [str(d.get('date') or '') for d in documents]
+        partition['writer'].write_table(pa.Table.from_pydict(dict(
+            account_number=[account] * len(documents),
+            date=dates,
+            payload=[json.dumps(d, ensure_ascii=False, default=str) for d in documents],
+        ), schema=ARCHIVE_SCHEMA))
+        partition['rows'] += len(documents)
+        partition['dates'].update(d for d in dates if d)
+
+    def close(self) -> List[ArchiveEntry]:
+        """
+        Finish the open files and add them to the manifest, a closed writer can not be written to again
+        return: The manifest entries of the written files
+        """
+        entries = []
+        for (account, month), partition in self._partitions.items():
+            partition['writer'].close()
+            os.replace(partition['tmp_path'], partition['path'])
+            entries.append(ArchiveEntry(path=str(partition['path'].relative_to(self.archive.root)),
+                                        source=self.source, account_number=account, month=month,
+                                        rows=partition['rows'], min_date=min(partition['dates'], default=None),
+                                        max_date=max(partition['dates'], default=None), scraped_at=self.scraped_at,
+                                        size_bytes=partition['path'].stat().st_size))
+        self._partitions = {}
+        self.archive._append_to_manifest(entries)
+        self.entries.extend(entries)
+        return entries
+
+
+def replay_archive(db_param: Dict[str, str], source: str, account_number: Optional[str] = None,
+                   start_month: Optional[str] = None, end_month: Optional[str] = None,
+                   table_name: str = 'credit_transaction', fields_to_update: Optional[List[str]] = None,
+                   identifier: Optional[str] = None, mongo_table_name: Optional[str] = None,
+                   archive: Optional[RawScrapeArchive] = None) -> int:
+    """
+    Rebuild mysql rows (and mongo documents when `mongo_table_name` is given) from the archive without scraping,
+    e.g. after a schema or translation change. The running totals of the replayed months are refreshed.
+    return: The number of replayed transactions
+    """
+    archive = archive or RawScrapeArchive()
+    batch = archive.read(source, account_number, start_month, end_month)
+    if not len(batch):
+        return 0
+    if mongo_table_name:
+        load_transactions_to_mongo(batch, db_param, mongo_table_name)
+    processed = batch.to_mysql_format(create_id=source in CREATE_ID_SOURCES)
+    _load_to_mysql(processed, db_param, table_name, fields_to_update, identifier)
+    refresh_affected_mtd_running_totals(db_param, get_affected_months(processed))
+    return len(processed)
@@ -0,0 +1,43 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Any, Optional, Callable
+
+import pandas as pd
+from sqlalchemy.engine import Engine
+
+from src.interface.common.utils import get_mysql_client
+
+DEFAULT_DB_THREADS = 4
+_db_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(max_workers=DEFAULT_DB_THREADS, thread_name_prefix='db')
+    return _db_executor
+
+
+async def run_in_db_executor(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run blocking database calls on the bounded db thread pool, so the event loop (and the telegram bot on it)
+    keeps running while the query waits
+    """
+    return await asyncio.get_running_loop().run_in_executor(get_db_executor(), partial(func, *args, **kwargs))
+
+
+class AsyncMySqlClient():
+    """
+    Awaitable facade over the pooled engine of `get_mysql_client`
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    async def read_sql(self, query: str, params: Optional[Any] = None, **kwargs) -> pd.DataFrame:
+        return await run_in_db_executor(pd.read_sql, query, self.engine, params=params, **kwargs)
+
+
+def get_async_mysql_client(mysql_param: Dict[str, str]) -> AsyncMySqlClient:
+    return AsyncMySqlClient(get_mysql_client(mysql_param))
@@ -0,0 +1,145 @@
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set
+
+from pydantic import BaseModel
+
+from src.interface import BACKFILL_CHECKPOINT_DIR, MONGO_CREDIT_TABLE_NAME
+from src.interface.common.archive import RawScrapeArchive, CREATE_ID_SOURCES
+from src.interface.common.batch import TransactionBatch
+from src.interface.common.running_totals import get_affected_months, refresh_affected_mtd_running_totals
+from src.interface.common.utils import _load_to_mysql, get_mongo_client
+
+DEFAULT_BACKFILL_WORKERS = 4
+ARCHIVE_BACKFILL_SOURCE = 'archive'
+MONGO_BACKFILL_SOURCE = 'mongo'
+
+
+class BackfillJob(BaseModel):
+    db_param: Dict[str, Any]
+    source: str
+    month: str
+    fields_to_update: List[str]
+    account_number: Optional[str] = None
+    read_from: str = ARCHIVE_BACKFILL_SOURCE
+    archive_root: Optional[str] = None
+    mongo_table_name: str = MONGO_CREDIT_TABLE_NAME
+    table_name: str = 'credit_transaction'
+
+
+class BackfillCheckpoint():
+    """
+    Completed months of a backfill, persisted after every month so an interrupted run resumes where it stopped
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.completed: Set[str] = set(json.loads(self.path.read_text())['completed']) if self.path.exists() \
+            else set()
+
+    @classmethod
+    def for_backfill(cls, source: str, fields_to_update: List[str], account_number: Optional[str] = None,
+                     directory: str = BACKFILL_CHECKPOINT_DIR) -> 'BackfillCheckpoint':
+        name = f"{source}-{account_number or 'all'}-{'-'.join(sorted(fields_to_update))}"
+        name = re.sub('[^A-Za-z0-9_-]', '_', name)
+        return cls(str(Path(directory) / f"{name}.json"))
+
+    def mark_completed(self, month: str):
+        self.completed.add(month)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(dict(completed=sorted(self.completed))))
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.completed = set()
+        self.path.unlink(missing_ok=True)
+
+
+def read_mongo_month(mongo_param: Dict[str, str], table_name: str, month: str,
+                     account_number: Optional[str] = None) -> List[Dict[str, Any]]:
+    query = {'date': {'$regex': f'^{re.escape(month)}'}}
+    if account_number:
+        query['accountNumber'] = str(account_number)
+    collection = get_mongo_client(mongo_param).get_collection(table_name)
+    return list(collection.find(query, projection={'_id': False}))
+
+
+def get_mongo_months(mongo_param: Dict[str, str], table_name: str, account_number: Optional[str] = None) -> List[str]:
+    pipeline = [{'$match': {'accountNumber': str(account_number)}}] if account_number else []
+    pipeline.append({'$group': {'_id': {'$substrBytes': ['$date', 0, 7]}}})
+    collection = get_mongo_client(mongo_param).get_collection(table_name)
+    return sorted(d['_id'] for d in collection.aggregate(pipeline) if d['_id'])
+
+
+def backfill_month(job: BackfillJob) -> int:
+    """
+    Recompute `fields_to_update` of one month from stored raw transactions, update them in mysql and refresh the
+    running totals of the month
+    return: The number of updated transactions
+    """
+    if job.read_from == MONGO_BACKFILL_SOURCE:
+        documents = read_mongo_month(job.db_param, job.mongo_table_name, job.month, job.account_number)
+        batch = TransactionBatch.from_records(documents) if documents else None
+    else:
+        archive = RawScrapeArchive(job.archive_root) if job.archive_root else RawScrapeArchive()
+        batch = archive.read(job.source, job.account_number, job.month, job.month)
+    if not batch or not len(batch):
+        return 0
+    processed = batch.to_mysql_format(create_id=job.source in CREATE_ID_SOURCES)
+    _load_to_mysql(processed, job.db_param, job.table_name, job.fields_to_update, 'id')
+    refresh_affected_mtd_running_totals(job.db_param, get_affected_months(processed))
+    return len(processed)
+
+
+def run_backfill(db_param: Dict[str, str], source: str, fields_to_update: List[str],
+                 account_number: Optional[str] = None, start_month: Optional[str] = None,
+                 end_month: Optional[str] = None, read_from: str = ARCHIVE_BACKFILL_SOURCE,
+                 max_workers: int = DEFAULT_BACKFILL_WORKERS, archive_root: Optional[str] = None,
+                 checkpoint: Optional[BackfillCheckpoint] = None, logger=None) -> Dict[str, int]:
+    """
+    Offline column backfill: months are processed in parallel worker processes from mongo or the raw archive,
+    completed months are checkpointed and skipped when a failed run is resumed
+    return: The number of updated transactions per month
+    """
+    if not fields_to_update:
+        raise ValueError("fields_to_update must be provided")
+    if read_from == MONGO_BACKFILL_SOURCE:
+        months = get_mongo_months(db_param, MONGO_CREDIT_TABLE_NAME, account_number)
+    elif read_from == ARCHIVE_BACKFILL_SOURCE:
+        archive = RawScrapeArchive(archive_root) if archive_root else RawScrapeArchive()
+        months = sorted({e.month for e in archive.iter_entries(source, account_number, start_month, end_month)})
+    else:
+        raise ValueError(f"unknown backfill source {read_from}")
+    months = [m for m in months if (not start_month or m >= start_month) and (not end_month or m <= end_month)]
+
+    checkpoint = checkpoint or BackfillCheckpoint.for_backfill(source, fields_to_update, account_number)
+    pending = [m for m in months if m not in checkpoint.completed]
+    if logger:
+        logger.info(f"backfilling {fields_to_update} for {len(pending)} of {len(months)} months "
+                    f"from {read_from} with {max_workers} workers")
+
+    jobs = [BackfillJob(db_param=db_param, source=source, month=month, fields_to_update=fields_to_update,
+                        account_number=account_number, read_from=read_from, archive_root=archive_root)
+            for month in pending]
+    updated, failed = {}, {}
+    with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(jobs) or 1))) as executor:
+        futures = {executor.submit(backfill_month, job): job.month for job in jobs}
+        for future in as_completed(futures):
+            month = futures[future]
+            try:
+                updated[month] = future.result()
+            except Exception as e:
+                failed[month] = e
+                continue
+            checkpoint.mark_completed(month)
+            if logger:
+                logger.info(f"backfilled {updated[month]} transactions of {month}")
+    if failed:
+        # completed months stay checkpointed, rerun to resume with the failed ones
+        raise RuntimeError(f"backfill failed for months {sorted(failed)}: {next(iter(failed.values()))}")
+    checkpoint.clear()
+    return updated
@@ -0,0 +1,181 @@
+from enum import Enum
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from src.interface.common.ids import ID_FIELDS, generate_transaction_ids_from_columns, TransactionIdCache
+from src.interface.common.model import MySqlTransaction
+from src.interface.common.normalizer import TransactionNormalizer
+
+MYSQL_TRANSACTION_FIELDS = list(MySqlTransaction.__fields__)
+MYSQL_REQUIRED_FIELDS = [name for name, field in MySqlTransaction.__fields__.items() if field.required]
+MYSQL_COLUMN_TYPES = {name: {float: 'float64', int: 'Int64'}.get(field.type_, 'string')
+                      for name, field in MySqlTransaction.__fields__.items()}
+# scraper field -> MySqlTransaction field
+MYSQL_FIELD_MAPPING = {
+    'description': 'description',
+    'memo': 'notes',
+    'processedDate': 'processed_date',
+    'date': 'date',
+    'originalAmount': 'original_amount',
+    'chargedAmount': 'charged_amount',
+    'category': 'category_raw',
+    'accountNumber': 'account_number',
+    'type': 'type',
+}
+# scraper fields of the Transaction model, other columns (e.g. the identifier) are typed by their values
+SCRAPED_COLUMN_TYPES = {
+    'date': 'string',
+    'processedDate': 'string',
+    'originalAmount': 'float64',
+    'originalCurrency': 'string',
+    'chargedAmount': 'float64',
+    'chargedCurrency': 'string',
+    'description': 'string',
+    'memo': 'string',
+    'type': 'string',
+    'status': 'string',
+    'category': 'string',
+    'accountNumber': 'string',
+}
+# pandas.api.types.infer_dtype -> column type, mixed and nested values (e.g. installments) stay python objects
+INFERRED_COLUMN_TYPES = {
+    'string': 'string',
+    'empty': 'string',
+    'integer': 'Int64',
+    'floating': 'float64',
+    'mixed-integer-float': 'float64',
+    'boolean': 'boolean',
+}
+
+
+def to_mysql_datetime(value: Any) -> Optional[str]:
+    """
+    Scraped ISO timestamps ('2023-05-03T00:00:00.000Z') as MySQL DATETIME literals, without the zone suffix
+    """
+    if value is None or value != value:  # None or NaN
+        return None
+    return str(value)[:19].replace('T', ' ')
+
+
+def with_column_types(frame: pd.DataFrame, column_types: Dict[str, str]) -> pd.DataFrame:
+    """
+    Cast the columns of `column_types`, the type of any other object column is inferred from its values
+    return: The typed frame
+    """
+    for column in frame.columns:
+        dtype = column_types.get(column)
+        if dtype is None and frame[column].dtype == object:
+            dtype = INFERRED_COLUMN_TYPES.get(pd.api.types.infer_dtype(frame[column], skipna=True))
+        if dtype is not None and not pd.api.types.is_dtype_equal(frame[column].dtype, dtype):
+            frame[column] = frame[column].astype(dtype)
+    return frame
+
+
+def column_values(column: pd.Series) -> List[Any]:
+    """
+    return: The values of a column as python scalars, nulls as None
+    """
+    return column.to_numpy(dtype=object, na_value=None).tolist()
+
+
+class TransactionBatch():
+    """
+    Batch of transactions held as one typed pandas DataFrame, replacing the per-transaction dict, pydantic model
+    and tuple copies of the ingest path. Amounts are float64, identifiers Int64 (or string), text and ISO dates
+    string columns, only nested values such as installments stay python objects.
+    The ids, MySQL rows and Mongo documents are built from the column arrays. Typing does not change the blake2b
+    ids, their encoding does not tell 10 from 10.0, the legacy sha256 ids do: they are migrated from the raw
+    scraped transactions instead (see `migrate_legacy_transaction_ids`).
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.frame.columns)
+
+    @classmethod
+    def from_records(cls, records: List[Union[Dict[str, Any], BaseModel]],
+                     account_number: Optional[str] = None) -> 'TransactionBatch':
+        records = [r.dict() if isinstance(r, BaseModel) else r for r in records]
+        # dtype=object keeps python ints/None until the columns are typed, otherwise an identifier column with gaps
+        # turns into floats
+        frame = pd.DataFrame(records, dtype=object)
+        for column in frame.columns:
+            if len(frame) and isinstance(frame[column].iloc[0], Enum):
+                frame[column] = frame[column].map(lambda e: e.value if isinstance(e, Enum) else e)
+        if account_number is not None:
+            frame['accountNumber'] = str(account_number)
+        return cls(with_column_types(frame, SCRAPED_COLUMN_TYPES))
+
+    @classmethod
+    def from_scraped(cls, data: Union[List[Dict[str, Any]], Dict[str, Any]], account_number: str = 'NA',
+                     normalizer: Optional[TransactionNormalizer] = None) -> 'TransactionBatch':
+        """
+        Columnar counterpart of `unpack_to_unnested_format`, pass a `normalizer` to read its aggregates afterwards
+        return: A TransactionBatch with an `accountNumber` column
+        """
+        if not data:
+            raise ValueError("no value to transform")
+        normalizer = normalizer or TransactionNormalizer(data, account_number)
+        return cls.from_records(list(normalizer))
+
+    @classmethod
+    def concat(cls, batches) -> 'TransactionBatch':
+        frames = [b.frame for b in batches]
+        if not frames:
+            return cls(pd.DataFrame())
+        # batches whose columns were typed differently (e.g. integer and string identifiers) are typed again
+        return cls(with_column_types(pd.concat(frames, ignore_index=True), SCRAPED_COLUMN_TYPES))
+
+    def get_ids(self) -> List[str]:
+        return generate_transaction_ids_from_columns(column_values(self.frame[field]) for field in ID_FIELDS)
+
+    def to_mysql_format(self, create_id: bool = False,
+                        id_cache: Optional[TransactionIdCache] = None) -> 'TransactionBatch':
+        """
+        Column-wise `translate_to_mysql_format`. Rows whose id is in `id_cache` were loaded before and are dropped.
+        return: A TransactionBatch with the MySqlTransaction columns
+        """
+        frame = self.frame
+        ids = pd.Series(self.get_ids(), index=frame.index, dtype='string') if create_id \
+            else frame['identifier'].astype('string')
+        if id_cache is not None and len(frame):
+            unseen = ~np.array(id_cache.contains(column_values(ids)), dtype=bool)
+            frame, ids = frame[unseen], ids[unseen]
+        columns = {mysql_field: frame[scraper_field] for scraper_field, mysql_field in MYSQL_FIELD_MAPPING.items()
+                   if scraper_field in frame}
+        columns['id'] = ids
+        for field in ['date', 'processed_date']:
+            if field in columns:
+                columns[field] = columns[field].astype('string').str.slice(0, 19).str.replace('T', ' ', regex=False)
+        mysql_frame = pd.DataFrame(columns, index=frame.index).reindex(columns=MYSQL_TRANSACTION_FIELDS)
+        mysql_frame = with_column_types(mysql_frame, MYSQL_COLUMN_TYPES)
+        missing = [f for f in MYSQL_REQUIRED_FIELDS if mysql_frame[f].isna().any()]
+        if missing:
+            raise ValueError(f"missing values for required fields {missing}")
+        return TransactionBatch(mysql_frame)
+
+    def to_rows(self, fields: Optional[List[str]] = None) -> List[Tuple]:
+        return list(zip(*(column_values(self.frame[field]) for field in fields or self.columns)))
+
+    def to_documents(self) -> List[Dict[str, Any]]:
+        columns = {column: column_values(self.frame[column]) for column in self.columns}
+        # typed columns do not tell a key missing from a scraped transaction from a null one, both are left out
+        return [{k: v for k, v in zip(columns, values) if v is not None} for values in zip(*columns.values())]
+
+    def to_pandas(self) -> pd.DataFrame:
+        return self.frame
+
+    def max_dates(self, date_field: str = 'date', account_field: str = 'account_number') -> Dict[str, str]:
+        if not len(self):
+            return {}
+        dates = self.frame[date_field].astype('string').str.slice(0, 10)
+        return dates.groupby(self.frame[account_field]).max().to_dict()
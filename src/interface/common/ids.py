@@ -0,0 +1,103 @@
+import json
+import sqlite3
+import time
+from hashlib import blake2b, sha256
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Tuple, Sequence
+
+from src.interface import ID_CACHE_PATH, ID_CACHE_TTL_SECONDS
+
+ID_FIELDS = ('identifier', 'description', 'date', 'processedDate', 'chargedAmount')
+ID_DIGEST_SIZE = 32
+NULL_FIELD_LENGTH = b'\xff\xff\xff\xff'
+
+
+def _encode_id_field(value: Any) -> bytes:
+    if value is None or value != value:  # None or NaN
+        return NULL_FIELD_LENGTH
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    encoded = str(value).encode('utf-8')
+    return len(encoded).to_bytes(4, 'big') + encoded
+
+
+def encode_id_fields(values: Iterable[Any]) -> bytes:
+    """
+    Fixed-order, length-prefixed encoding of the id fields, so no two different rows share an encoding
+    (unlike joining strings) and 10 and 10.0 encode the same
+    """
+    return b''.join(_encode_id_field(value) for value in values)
+
+
+def generate_transaction_ids(rows: Iterable[Tuple]) -> List[str]:
+    """
+    Hash rows of ID_FIELDS values
+    return: blake2b-256 hex ids, as long as the legacy sha256 ids
+    """
+    return [blake2b(encode_id_fields(row), digest_size=ID_DIGEST_SIZE).hexdigest() for row in rows]
+
+
+def generate_transaction_ids_from_columns(columns: Iterable[Sequence[Any]]) -> List[str]:
+    """
+    Hash ID_FIELDS columns, encoding one column at a time
+    return: The ids `generate_transaction_ids` gives for the same rows
+    """
+    encoded_columns = [[_encode_id_field(value) for value in column] for column in columns]
+    return [blake2b(b''.join(fields), digest_size=ID_DIGEST_SIZE).hexdigest() for fields in zip(*encoded_columns)]
+
+
+def generate_transaction_id(transaction: Dict[str, Any]) -> str:
+    return generate_transaction_ids([tuple(transaction[k] for k in ID_FIELDS)])[0]
+
+
+def generate_legacy_transaction_ids(rows: Iterable[Tuple]) -> List[str]:
+    return [sha256(json.dumps(dict(zip(ID_FIELDS, row)), sort_keys=True).encode('utf-8')).hexdigest()
+            for row in rows]
+
+
+class TransactionIdCache():
+    """
+    On-disk set of transaction ids already loaded to mysql, so rows of overlapping scrapes are dropped before
+    they are translated and sent to the database again.
+    The cache is never checked against mysql: ids expire after `ttl_seconds`, so rows deleted or rewritten in mysql
+    are loaded again by a later scrape, and `clear` drops every id when mysql ids change (see the id migration).
+    """
+
+    def __init__(self, path: str = ID_CACHE_PATH, ttl_seconds: float = ID_CACHE_TTL_SECONDS):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._connection = sqlite3.connect(path)
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(transaction_ids)")]
+        with self._connection:
+            if columns and 'added_at' not in columns:
+                # caches written before expiry have no insertion time, start them over
+                self._connection.execute("DROP TABLE transaction_ids")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS transaction_ids "
+                                     "(id TEXT PRIMARY KEY, added_at REAL NOT NULL)")
+            self._connection.execute("DELETE FROM transaction_ids WHERE added_at < ?", (self._expired_before(),))
+
+    def _expired_before(self) -> float:
+        return time.time() - self.ttl_seconds
+
+    def contains(self, ids: List[str]) -> List[bool]:
+        seen = set()
+        expired_before = self._expired_before()
+        # sqlite limits the number of bound variables per statement
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            query = f"SELECT id FROM transaction_ids WHERE id IN ({', '.join('?' * len(chunk))}) AND added_at >= ?"
+            seen.update(row[0] for row in self._connection.execute(query, [*chunk, expired_before]))
+        return [i in seen for i in ids]
+
+    def add(self, ids: Iterable[str]):
+        added_at = time.time()
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO transaction_ids (id, added_at) VALUES (?, ?)",
+                                         ((i, added_at) for i in ids))
+
+    def clear(self):
+        with self._connection:
+            self._connection.execute("DELETE FROM transaction_ids")
+
+    def close(self):
+        self._connection.close()
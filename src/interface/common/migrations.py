@@ -0,0 +1,112 @@
+from typing import List, Dict, Any, Tuple, Optional, Set
+
+from sqlalchemy.engine import Engine
+
+from src.interface.common.utils import get_mysql_client
+
+TRANSACTION_TABLE_NAME = 'credit_transaction'
+TRANSACTION_DATETIME_COLUMNS = ('date', 'processed_date')
+# the watermark and per-account reads, the serving and notification date ranges, the training range and category joins
+TRANSACTION_INDEXES: Dict[str, Tuple[str, ...]] = {
+    'ix_account_number_date': ('account_number', 'date'),
+    'ix_date': ('date',),
+    'ix_processed_date': ('processed_date',),
+    'ix_category': ('category',),
+}
+DATETIME_TYPES = {'date', 'datetime', 'timestamp'}
+_checked_tables: Set[Tuple] = set()
+
+
+def get_columns(db: Engine, table_name: str) -> List[Dict[str, Any]]:
+    rows = db.execute("SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE FROM information_schema.COLUMNS "
+                      "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+                      (table_name,)).fetchall()
+    return [dict(name=r[0], data_type=r[1].lower(), nullable=r[2] == 'YES') for r in rows]
+
+
+def get_index_names(db: Engine, table_name: str) -> List[str]:
+    rows = db.execute("SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+                      "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table_name,)).fetchall()
+    return [r[0] for r in rows]
+
+
+def migrate_datetime_columns(mysql_param: Dict[str, str], table_name: str = TRANSACTION_TABLE_NAME,
+                             columns: Tuple[str, ...] = TRANSACTION_DATETIME_COLUMNS) -> List[str]:
+    """
+    Convert string date columns to DATETIME in place of the old column (same name, position and nullability).
+    Values are parsed from their first 19 characters, so ISO timestamps keep their date as read so far.
+    Columns that are already temporal are skipped, the migration can be rerun safely.
+    return: The migrated columns
+    """
+    db = get_mysql_client(mysql_param)
+    migrated = []
+    table_columns = get_columns(db, table_name)
+    names = [c['name'] for c in table_columns]
+    for column in table_columns:
+        if column['name'] not in columns or column['data_type'] in DATETIME_TYPES:
+            continue
+        name, typed = column['name'], f"{column['name']}__typed"
+        position = names.index(name)
+        after = f"AFTER `{names[position - 1]}`" if position else "FIRST"
+        null = "NULL" if column['nullable'] else "NOT NULL"
+        if typed in names:
+            db.execute(f"ALTER TABLE `{table_name}` DROP COLUMN `{typed}`")
+        db.execute(f"ALTER TABLE `{table_name}` ADD COLUMN `{typed}` DATETIME NULL")
+        db.execute(f"UPDATE `{table_name}` SET `{typed}` = CAST(REPLACE(LEFT(`{name}`, 19), 'T', ' ') AS DATETIME)")
+        db.execute(f"ALTER TABLE `{table_name}` DROP COLUMN `{name}`, "
+                   f"CHANGE COLUMN `{typed}` `{name}` DATETIME {null} {after}")
+        migrated.append(name)
+    return migrated
+
+
+def check_datetime_columns(mysql_param: Dict[str, str], table_name: str = TRANSACTION_TABLE_NAME):
+    """
+    Fail a load before it writes DATETIME literals next to the ISO timestamps of unmigrated string columns.
+    Only a passing check is remembered (per process and table), the migration itself is an explicit step.
+    """
+    key = (mysql_param.get('mysql_host'), mysql_param.get('mysql_port'), mysql_param.get('mysql_database'), table_name)
+    if key in _checked_tables:
+        return
+    columns = get_columns(get_mysql_client(mysql_param), table_name)
+    unmigrated = [c['name'] for c in columns
+                  if c['name'] in TRANSACTION_DATETIME_COLUMNS and c['data_type'] not in DATETIME_TYPES]
+    if unmigrated:
+        raise RuntimeError(f"columns {unmigrated} of {table_name} are not DATETIME yet, "
+                           f"run the migrate_transaction_schema_flow before loading")
+    _checked_tables.add(key)
+
+
+def ensure_indexes(mysql_param: Dict[str, str], table_name: str = TRANSACTION_TABLE_NAME,
+                   indexes: Optional[Dict[str, Tuple[str, ...]]] = None) -> List[str]:
+    """
+    Create the missing indexes
+    return: The created index names
+    """
+    db = get_mysql_client(mysql_param)
+    existing = set(get_index_names(db, table_name))
+    created = []
+    for index_name, index_columns in (indexes or TRANSACTION_INDEXES).items():
+        if index_name in existing:
+            continue
+        db.execute(f"CREATE INDEX `{index_name}` ON `{table_name}` ({', '.join(f'`{c}`' for c in index_columns)})")
+        created.append(index_name)
+    return created
+
+
+def explain(mysql_param: Dict[str, str], query: str) -> List[Dict[str, Any]]:
+    result = get_mysql_client(mysql_param).execute(f"EXPLAIN {query}")
+    return [dict(zip(result.keys(), row)) for row in result.fetchall()]
+
+
+def is_full_scan(plan: List[Dict[str, Any]]) -> bool:
+    return any(row.get('type') == 'ALL' for row in plan)
+
+
+def migrate_transaction_schema(mysql_param: Dict[str, str],
+                               table_name: str = TRANSACTION_TABLE_NAME) -> Dict[str, List[str]]:
+    """
+    Typed date columns and the range read indexes of the transactions table
+    return: The migrated columns and created indexes
+    """
+    return dict(columns=migrate_datetime_columns(mysql_param, table_name),
+                indexes=ensure_indexes(mysql_param, table_name))
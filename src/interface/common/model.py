@@ -25,3 +25,19 @@ class MySqlBalance(BaseModel):
     balance_currency: str
     account_number: str
 
+
+class UpsertResult(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    chunks: int = 0
+
+
+class MongoIngestResult(BaseModel):
+    new: int = 0
+    duplicates: int = 0
+
+    @property
+    def duplicate_ratio(self) -> float:
+        total = self.new + self.duplicates
+        return self.duplicates / total if total else 0.
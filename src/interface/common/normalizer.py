@@ -0,0 +1,95 @@
+from enum import Enum
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable, Union
+
+from pydantic import BaseModel
+
+# schema name -> (detector, account iterator yielding (account_number, index, transactions))
+AccountIterator = Callable[[Any, str], Iterator[Tuple[str, Optional[Any], List[Any]]]]
+SCHEMA_REGISTRY: Dict[str, Tuple[Callable[[Any], bool], AccountIterator]] = {}
+
+
+def register_schema(name: str, detector: Callable[[Any], bool]):
+    """
+    Register a scraper payload schema, detectors are tried in registration order
+    """
+
+    def decorator(iter_accounts: AccountIterator) -> AccountIterator:
+        SCHEMA_REGISTRY[name] = (detector, iter_accounts)
+        return iter_accounts
+
+    return decorator
+
+
+def _first(data: Any) -> Any:
+    return next(iter(data), None) if isinstance(data, list) else None
+
+
+@register_schema('ibs_data_structure', lambda data: isinstance(data, dict) and 'accounts' in data)
+def _iter_ibs_accounts(data: Dict[str, Any], account_number: str):
+    for account in data['accounts']:
+        yield str(account.get('accountNumber', account_number)), None, account.get('txns') or []
+
+
+@register_schema('list_of_transactions',
+                 lambda data: isinstance(_first(data), (dict, BaseModel)) and 'identifier' in _transaction_keys(data))
+def _iter_transaction_list(data: List[Dict[str, Any]], account_number: str):
+    yield str(account_number), None, data
+
+
+@register_schema('list_of_dicts_of_transactions',
+                 lambda data: isinstance(_first(data), dict) and
+                 isinstance(next(iter(_first(data).values()), None), dict) and
+                 'txns' in next(iter(_first(data).values())))
+def _iter_dicts_of_transactions(data: List[Dict[str, Dict[str, Any]]], account_number: str):
+    for d in data:
+        for account_transactions in d.values():
+            yield str(account_transactions.get('accountNumber')), account_transactions.get('index'), \
+                account_transactions.get('txns', [])
+
+
+def _transaction_keys(data: List[Any]):
+    first = _first(data)
+    return first.__fields__ if isinstance(first, BaseModel) else first
+
+
+def detect_schema(data: Any) -> Optional[str]:
+    if not data:
+        return None
+    return next((name for name, (detector, _) in SCHEMA_REGISTRY.items() if detector(data)), None)
+
+
+def _to_record(transaction: Union[Dict[str, Any], BaseModel]) -> Dict[str, Any]:
+    if isinstance(transaction, BaseModel):
+        return {k: v.value if isinstance(v, Enum) else v for k, v in transaction.dict().items()}
+    return dict(transaction)
+
+
+class TransactionNormalizer():
+    """
+    Single pass over a scraper payload of any registered schema, yielding new flat transactions with their
+    `accountNumber` (and `index` when the payload has one). The input is never mutated, the max transaction date
+    per account is collected on the way.
+    """
+
+    def __init__(self, data: Any, account_number: str = 'NA', schema: Optional[str] = None):
+        self.data = data
+        self.account_number = account_number
+        self.schema = schema or detect_schema(data)
+        if not self.schema:
+            raise ValueError("data structure type not recognized")
+        self.max_dates: Dict[str, str] = {}
+        self.count = 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        _, iter_accounts = SCHEMA_REGISTRY[self.schema]
+        for account_number, index, transactions in iter_accounts(self.data, self.account_number):
+            for transaction in transactions:
+                record = _to_record(transaction)
+                record['accountNumber'] = account_number
+                if index is not None:
+                    record['index'] = index
+                transaction_date = record.get('date')
+                if transaction_date and transaction_date > self.max_dates.get(account_number, ''):
+                    self.max_dates[account_number] = transaction_date
+                self.count += 1
+                yield record
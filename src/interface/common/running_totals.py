@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Union
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from src.interface import MTD_RUNNING_TOTALS_TABLE_NAME
+from src.interface.common.batch import TransactionBatch
+from src.interface.common.model import MySqlTransaction
+from src.interface.common.utils import get_mysql_client
+
+MTD_SOURCE_TABLE_NAME = 'clean_transactions'
+UNCATEGORISED_ID = -1
+# same expense filter as the stg_expense_transaction dbt model
+EXPENSE_FILTER = "(transaction_type = 'expense' AND category_id NOT IN (41, 47) OR category_id IS NULL)"
+
+
+def create_mtd_running_totals_table(mysql_param: Dict[str, str]):
+    get_mysql_client(mysql_param).execute(f"""
+        CREATE TABLE IF NOT EXISTS `{MTD_RUNNING_TOTALS_TABLE_NAME}` (
+            yearmonth CHAR(7) NOT NULL,
+            account_number VARCHAR(64) NOT NULL,
+            category_id INT NOT NULL,
+            category VARCHAR(255) NULL,
+            month_to_date_expense DOUBLE NOT NULL,
+            last_date DATE NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (yearmonth, account_number, category_id)
+        )""")
+
+
+def get_affected_months(data: Union[TransactionBatch, pd.DataFrame, List[MySqlTransaction]],
+                        affected: Optional[Dict[str, Set[str]]] = None, date_field: str = 'date',
+                        account_field: str = 'account_number') -> Dict[str, Set[str]]:
+    """
+    Months touched by inserted or recategorised transactions
+    return: The account numbers per yearmonth, merged into `affected`
+    """
+    affected = {} if affected is None else affected
+    frame = data.frame if isinstance(data, TransactionBatch) else data
+    if isinstance(frame, pd.DataFrame):
+        pairs = zip(frame[date_field], frame[account_field]) if len(frame) else []
+    else:
+        pairs = ((getattr(t, date_field), getattr(t, account_field)) for t in frame)
+    for transaction_date, account_number in pairs:
+        if not pd.isnull(transaction_date):
+            affected.setdefault(str(transaction_date)[:7], set()).add(str(account_number))
+    return affected
+
+
+def refresh_mtd_running_totals(mysql_param: Dict[str, str], yearmonth: str,
+                               account_numbers: Optional[Set[str]] = None,
+                               source_table: str = MTD_SOURCE_TABLE_NAME) -> int:
+    """
+    Recompute the running totals of one month, for `account_numbers` only when given, in one transaction.
+    Uncategorised expenses are kept under UNCATEGORISED_ID.
+    return: The number of (account_number, category_id) totals of the month
+    """
+    if account_numbers is not None and not account_numbers:
+        return 0
+    create_mtd_running_totals_table(mysql_param)
+    month_start = datetime.strptime(yearmonth, '%Y-%m')
+    params = [month_start.strftime('%Y-%m-%d'), (month_start + relativedelta(months=1)).strftime('%Y-%m-%d')]
+    account_filter = ""
+    if account_numbers:
+        account_filter = f"AND account_number IN ({', '.join(['%s'] * len(account_numbers))})"
+        params += sorted(account_numbers)
+    with get_mysql_client(mysql_param).begin() as conn:
+        conn.execute(f"DELETE FROM `{MTD_RUNNING_TOTALS_TABLE_NAME}` WHERE yearmonth = %s {account_filter}",
+                     tuple([yearmonth] + params[2:]))
+        return conn.execute(f"""
+            INSERT INTO `{MTD_RUNNING_TOTALS_TABLE_NAME}`
+                (yearmonth, account_number, category_id, category, month_to_date_expense, last_date)
+            SELECT %s, account_number, COALESCE(category_id, {UNCATEGORISED_ID}), MAX(category), SUM(charged),
+                   DATE(MAX(date))
+            FROM `{source_table}`
+            WHERE date >= %s AND date < %s {account_filter} AND {EXPENSE_FILTER}
+            GROUP BY account_number, COALESCE(category_id, {UNCATEGORISED_ID})
+        """, tuple([yearmonth] + params)).rowcount
+
+
+def get_missing_mtd_accounts(mysql_param: Dict[str, str], yearmonth: str,
+                             source_table: str = MTD_SOURCE_TABLE_NAME) -> Set[str]:
+    """
+    Accounts with expenses in the month but no running totals, e.g. loaded by a path that did not refresh them
+    return: The missing account numbers
+    """
+    month_start = datetime.strptime(yearmonth, '%Y-%m')
+    rows = get_mysql_client(mysql_param).execute(f"""
+        SELECT DISTINCT s.account_number
+        FROM `{source_table}` s
+        WHERE s.date >= %s AND s.date < %s AND {EXPENSE_FILTER}
+            AND NOT EXISTS (SELECT 1 FROM `{MTD_RUNNING_TOTALS_TABLE_NAME}` t
+                            WHERE t.yearmonth = %s AND t.account_number = s.account_number)
+    """, (month_start.strftime('%Y-%m-%d'), (month_start + relativedelta(months=1)).strftime('%Y-%m-%d'),
+          yearmonth)).fetchall()
+    return {str(r[0]) for r in rows}
+
+
+def refresh_affected_mtd_running_totals(mysql_param: Dict[str, str],
+                                        affected: Dict[str, Set[str]]) -> Dict[str, int]:
+    return {yearmonth: refresh_mtd_running_totals(mysql_param, yearmonth, account_numbers)
+            for yearmonth, account_numbers in sorted(affected.items())}
@@ -1,20 +1,36 @@
-import json
 import logging
-from datetime import datetime, timedelta
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, date
 from hashlib import sha256
-from typing import List, Dict, Any, Optional, Tuple, Iterable
+from itertools import groupby, islice
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator, Union
 
+import pandas as pd
 import prefect
 import pymongo
 from prefect import get_run_logger, task
+from pandas.api.types import union_categoricals
 from pydantic import BaseModel
 from pymongo import WriteConcern
+from pymongo.collection import Collection
+from pymongo.database import Database
 from pymongo.errors import BulkWriteError
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import ProgrammingError, OperationalError
 
 from src.core.common import TIMESTAMP_FORMAT, DATE_FORMAT, get_running_env
 from src.core.constants import LOCAL_UBUNTU_HOST
-from src.interface.common.model import MySqlTransaction, MySqlBalance
+from src.interface import WATERMARK_TABLE_NAME, ID_MIGRATION_TABLE_NAME, MONGO_CREDIT_TABLE_NAME, \
+    MONGO_BANK_ACCOUNT_TABLE_NAME
+from src.interface.common.batch import TransactionBatch, to_mysql_datetime
+from src.interface.common.ids import ID_FIELDS, generate_transaction_id, generate_transaction_ids, \
+    generate_legacy_transaction_ids
+from src.interface.common.model import MySqlTransaction, MySqlBalance, UpsertResult, MongoIngestResult
+from src.interface.common.normalizer import TransactionNormalizer, detect_schema
 
 
 def get_logger() -> Optional[logging.Logger]:
@@ -34,62 +50,37 @@ def get_today():
 def unpack_to_unnested_format(data: List[Dict[str, Any]], account_number: str = 'NA') -> List[Dict[str, Any]]:
     if not data:
         raise ValueError("no value to transform")
+    return list(TransactionNormalizer(data, account_number))
 
-    res = []
-    data_structure_type = infer_data_structure_type(data)
-    if not data_structure_type:
-        raise ValueError("data structure type not recognized")
-    if data_structure_type == 'list_of_transactions':
-        append_transaction_list_collection(data, res, account_number)
-    elif data_structure_type == 'list_of_dicts_of_transactions':
-        for d in data:
-            [append_transactions_collection(v, res) for k, v in d]
-    elif isinstance(data, dict) and data_structure_type == 'ibs_data_structure':
-        accounts = next(iter(data['accounts']))
-        trans_data, account_number = accounts['txns'], accounts['accountNumber']
-        append_transaction_list_collection(trans_data, res, account_number)
-    return res
+
+def iter_account_chunks(records: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    Group a stream of flat transactions into bounded chunks of a single account
+    return: An iterator of (account_number, transactions) with at most chunk_size transactions each
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    for account_number, account_records in groupby(records, key=lambda r: str(r.get('accountNumber'))):
+        while chunk := list(islice(account_records, chunk_size)):
+            yield account_number, chunk
 
 
 def infer_data_structure_type(data: List[Dict[str, Any]]) -> Optional[str]:
-    if isinstance(data, dict) and 'accounts' in data:
-        return 'ibs_data_structure'
-    d = next(iter(data))
-    if not isinstance(d, dict):
-        return
-    if 'identifier' in d:
-        return 'list_of_transactions'
-    d_ = next(iter(d.values()))
-    if isinstance(d_, dict) and 'txns' in d_:
-        return 'list_of_dicts_of_transactions'
-    return
+    return detect_schema(data)
 
 
 def add_transaction_date_and_account_to_balance_data(balance: Dict[str, Any], transactions: List[Dict[str, Any]],
-                                                     account_number: str) -> Dict[str, Any]:
-    last_transaction_date = max(
-        [datetime.strptime(txn.get('date'), TIMESTAMP_FORMAT) for txn in transactions]).date() + timedelta(
-        days=1)
-    balance.update({'last_transaction_date': datetime.strftime(last_transaction_date, DATE_FORMAT)})
-    balance.update({'accountNumber': account_number})
-    return balance
-
-
-def append_transactions_collection(account_transactions: Dict[str, Any], updating_result: List[Dict[str, Any]]):
-    account_number = account_transactions.get('accountNumber')
-    index = account_transactions.get('index')
-    for t in account_transactions.get('txns', []):
-        transformed_txns = json.loads(t.json())
-        transformed_txns.update({"accountNumber": str(account_number),
-                                 "index": index})
-        updating_result.append(transformed_txns)
-
-
-def append_transaction_list_collection(account_transactions: List[Dict[str, Any]],
-                                       updating_result: List[Dict[str, Any]], account_number: str):
-    for trans in account_transactions:
-        trans.update({"accountNumber": str(account_number)})
-        updating_result.append(trans)
+                                                     account_number: str,
+                                                     max_transaction_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    return: A copy of the balance with its account and the day after the last transaction,
+    pass `max_transaction_date` when it was already tracked by the normalizer
+    """
+    max_transaction_date = max_transaction_date or max(txn.get('date') for txn in transactions)
+    last_transaction_date = datetime.strptime(max_transaction_date, TIMESTAMP_FORMAT).date() + timedelta(days=1)
+    return {**balance,
+            'last_transaction_date': datetime.strftime(last_transaction_date, DATE_FORMAT),
+            'accountNumber': account_number}
 
 
 # region MySQL utils
@@ -108,15 +99,13 @@ def translate_to_mysql_format(data: List[Dict[str, Any]], create_id: bool = Fals
     res = []
     for d in data:
         try:
-            id_dict = {k: d[k] for k in ['identifier', 'description', 'date', 'processedDate', 'chargedAmount']}
-            unique_id = sha256(json.dumps(id_dict, sort_keys=True).encode('utf-8')).hexdigest() if create_id else d.get(
-                'identifier')
+            unique_id = generate_transaction_id(d) if create_id else d.get('identifier')
             transaction = MySqlTransaction(
                 id=unique_id,
                 description=d.get('description'),
                 notes=d.get('memo'),
-                processed_date=d.get('processedDate'),
-                date=d.get('date'),
+                processed_date=to_mysql_datetime(d.get('processedDate')),
+                date=to_mysql_datetime(d.get('date')),
                 original_amount=d.get('originalAmount'),
                 charged_amount=d.get('chargedAmount'),
                 category_raw=d.get('category'),
@@ -129,31 +118,149 @@ def translate_to_mysql_format(data: List[Dict[str, Any]], create_id: bool = Fals
     return res
 
 
-def get_mysql_client(mysql_param: Dict[str, str]):
+DEFAULT_MYSQL_POOL_SIZE = 5
+DEFAULT_MYSQL_MAX_OVERFLOW = 5
+DEFAULT_MYSQL_POOL_RECYCLE_SECONDS = 30 * 60
+_mysql_engines: Dict[Tuple, Engine] = {}
+_mysql_engines_lock = threading.Lock()
+
+
+def get_mysql_client(mysql_param: Dict[str, str], pool_size: int = DEFAULT_MYSQL_POOL_SIZE,
+                     max_overflow: int = DEFAULT_MYSQL_MAX_OVERFLOW,
+                     pool_recycle: int = DEFAULT_MYSQL_POOL_RECYCLE_SECONDS, pool_pre_ping: bool = True,
+                     local_infile: bool = False) -> Engine:
+    """
+    Process-wide engine registry, engines (and their connection pools) are cached by connection parameters so
+    every load and read of a run reuses the same connections. The pool settings only apply to a new engine.
+    `local_infile` engines allow LOAD DATA LOCAL INFILE and are kept apart from the others.
+    return: A pooled SQLAlchemy engine
+    """
     host = mysql_param.get('mysql_host')
     database = mysql_param.get('mysql_database')
     mysql_port = mysql_param.get('mysql_port')
     username = mysql_param.get('mysql_username')
     password = mysql_param.get('mysql_password')
-    uri = f"mysql+pymysql://{username}:{password}@{host}:{mysql_port}/{database}"
-    db = create_engine(uri)
-    return db
-
-
-def get_insert_query(table_name: str, data: Optional[List[Dict[str, Any]]]) -> str:
+    key = (host, mysql_port, database, username, password, local_infile)
+    with _mysql_engines_lock:
+        if key not in _mysql_engines:
+            uri = f"mysql+pymysql://{username}:{password}@{host}:{mysql_port}/{database}"
+            _mysql_engines[key] = create_engine(uri, pool_size=pool_size, max_overflow=max_overflow,
+                                                pool_recycle=pool_recycle, pool_pre_ping=pool_pre_ping,
+                                                connect_args=dict(local_infile=True) if local_infile else {})
+        return _mysql_engines[key]
+
+
+def get_mysql_pool_stats() -> Dict[str, Dict[str, Any]]:
+    stats = {}
+    for (host, mysql_port, database, username, _, local_infile), engine in list(_mysql_engines.items()):
+        pool = engine.pool
+        name = f"{username}@{host}:{mysql_port}/{database}" + (" (local_infile)" if local_infile else "")
+        stats[name] = dict(
+            size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(),
+            overflow=pool.overflow(), status=pool.status())
+    return stats
+
+
+def dispose_mysql_clients(close: bool = True):
+    with _mysql_engines_lock:
+        for engine in _mysql_engines.values():
+            engine.dispose(close=close)
+        _mysql_engines.clear()
+
+
+def _reset_mysql_clients_after_fork():
+    # a forked child must not share the parent's sockets, it drops the inherited pools without closing them.
+    # the lock is replaced since it may have been held by another thread of the parent while forking
+    global _mysql_engines_lock
+    _mysql_engines_lock = threading.Lock()
+    for engine in _mysql_engines.values():
+        engine.dispose(close=False)
+    _mysql_engines.clear()
+
+
+os.register_at_fork(after_in_child=_reset_mysql_clients_after_fork)
+
+
+DEFAULT_READ_MEMORY_BUDGET_MB = 64
+DEFAULT_READ_CHUNK_SIZE = 1000
+# batches are processed while the server-side cursor is open, mysql drops the stream after net_write_timeout
+READ_STREAM_TIMEOUT_SECONDS = 60 * 60
+
+
+def cast_dtypes(frame: pd.DataFrame, dtypes: Dict[str, str]) -> pd.DataFrame:
+    for column, dtype in dtypes.items():
+        if column not in frame:
+            continue
+        if dtype.startswith('datetime64'):
+            frame[column] = pd.to_datetime(frame[column], errors='coerce')
+        else:
+            frame[column] = frame[column].astype(dtype)
+    return frame
+
+
+def read_sql_batches(mysql_param: Dict[str, str], query: str, dtypes: Optional[Dict[str, str]] = None,
+                     memory_budget_mb: float = DEFAULT_READ_MEMORY_BUDGET_MB,
+                     initial_chunk_size: int = DEFAULT_READ_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Stream a query through a server-side cursor as typed DataFrame batches. The batch size is re-estimated from
+    the memory of each typed batch, so a batch stays within `memory_budget_mb` whatever the row width.
+    return: An iterator of DataFrames with the `dtypes` columns cast
+    """
+    budget_bytes = memory_budget_mb * 1024 * 1024
+    with get_mysql_client(mysql_param).connect() as conn:
+        conn.exec_driver_sql(f"SET SESSION net_write_timeout = {READ_STREAM_TIMEOUT_SECONDS}")
+        result = conn.execution_options(stream_results=True).exec_driver_sql(query)
+        columns = list(result.keys())
+        chunk_size = initial_chunk_size
+        while rows := result.fetchmany(chunk_size):
+            frame = cast_dtypes(pd.DataFrame.from_records(rows, columns=columns), dtypes or {})
+            row_bytes = frame.memory_usage(deep=True).sum() / len(frame)
+            chunk_size = max(1, int(budget_bytes // max(row_bytes, 1)))
+            yield frame
+
+
+def concat_batches(batches: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate typed batches without falling back to object columns: every batch has its own categories,
+    they are unified first
+    """
+    batches = list(batches)
+    if not batches:
+        return pd.DataFrame()
+    for column in batches[0].columns:
+        if isinstance(batches[0][column].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([b[column] for b in batches], ignore_order=True).categories
+            for b in batches:
+                b[column] = b[column].cat.set_categories(categories)
+    return pd.concat(batches, ignore_index=True)
+
+
+DEFAULT_UPSERT_CHUNK_SIZE = 1000
+DEFAULT_LOAD_DATA_THRESHOLD_ROWS = 20000
+
+
+def get_data_fields(data: Union[List[BaseModel], TransactionBatch]) -> List[str]:
+    if isinstance(data, TransactionBatch):
+        return data.columns
     d = next(iter(data))
     assert isinstance(d, BaseModel)
-    num_objects = len(d.dict())
-    fields_str = "(" + ", ".join([f"`{k}`" for k in d.dict().keys()]) + ")"
+    return list(d.dict().keys())
+
+
+def get_insert_query(table_name: str, data: Union[List[BaseModel], TransactionBatch]) -> str:
+    fields = get_data_fields(data)
+    num_objects = len(fields)
+    fields_str = "(" + ", ".join([f"`{k}`" for k in fields]) + ")"
     values_str = "(" + ", ".join(["%s" for _ in range(num_objects)]) + ")"
     query = f"INSERT IGNORE INTO  `{table_name}` {fields_str}  VALUES{values_str}"
     return query
 
 
-def get_update_query(table_name: str, data: Optional[List[Dict[str, Any]]], fields_to_update: List[str],
+def get_update_query(table_name: str, data: Union[List[BaseModel], TransactionBatch], fields_to_update: List[str],
                      id_field: str) -> str:
-    d = next(iter(data))
-    assert isinstance(d, BaseModel)
+    unknown_fields = set(fields_to_update + [id_field]) - set(get_data_fields(data))
+    if unknown_fields:
+        raise ValueError(f"fields {sorted(unknown_fields)} are not part of the data")
     fields_str = ", ".join([f"`{k}` = %s" for k in fields_to_update])
     id_str = f"{id_field} = %s"
     query = f"UPDATE `{table_name}` SET {fields_str}  WHERE {id_str}"
@@ -161,6 +268,8 @@ def get_update_query(table_name: str, data: Optional[List[Dict[str, Any]]], fiel
 
 
 def translate_to_sql_credit_format(data, fields_to_update: Optional[List[str]] = None) -> List[Tuple]:
+    if isinstance(data, TransactionBatch):
+        return data.to_rows(fields_to_update)
     records = []
     for d in data:
         d_ = d.dict()
@@ -169,28 +278,329 @@ def translate_to_sql_credit_format(data, fields_to_update: Optional[List[str]] =
     return records
 
 
-def _load_to_mysql(data: Optional[List[Dict[str, Any]]], mysql_param: Dict[str, str], table_name: str,
-                   fields_to_update: Optional[List[str]] = None, identifier: Optional[str] = None):
+def get_upsert_query(table_name: str, fields: List[str], fields_to_update: List[str], num_rows: int) -> str:
+    fields_str = "(" + ", ".join([f"`{k}`" for k in fields]) + ")"
+    values_str = ", ".join(["(" + ", ".join(["%s" for _ in fields]) + ")"] * num_rows)
+    update_str = ", ".join([f"`{k}` = VALUES(`{k}`)" for k in fields_to_update])
+    return f"INSERT INTO `{table_name}` {fields_str} VALUES {values_str} ON DUPLICATE KEY UPDATE {update_str}"
+
+
+def upsert_to_mysql(data: Union[List[BaseModel], TransactionBatch], mysql_param: Dict[str, str], table_name: str,
+                    fields_to_update: List[str], identifier: str = 'id',
+                    chunk_size: int = DEFAULT_UPSERT_CHUNK_SIZE) -> UpsertResult:
+    """
+    Multi-row INSERT ... ON DUPLICATE KEY UPDATE of `fields_to_update` only, one transaction per chunk.
+    Rows are de-duplicated by `identifier` first, the last row of an id wins.
+    return: The inserted, updated and unchanged row counts of the distinct ids
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    fields = get_data_fields(data)
+    unknown_fields = set(fields_to_update + [identifier]) - set(fields)
+    if unknown_fields:
+        raise ValueError(f"fields {sorted(unknown_fields)} are not part of the data")
+    id_index = fields.index(identifier)
+    # a repeated id would be counted as both inserted and updated, keep its last row as the upsert itself would
+    records = list({r[id_index]: r for r in translate_to_sql_credit_format(data)}.values())
     db = get_mysql_client(mysql_param)
+    result = UpsertResult()
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        ids = [r[id_index] for r in chunk]
+        with db.begin() as conn:
+            existing = conn.exec_driver_sql(
+                f"SELECT COUNT(*) FROM `{table_name}` WHERE `{identifier}` IN ({', '.join(['%s'] * len(ids))})",
+                tuple(ids)).scalar()
+            affected = conn.exec_driver_sql(get_upsert_query(table_name, fields, fields_to_update, len(chunk)),
+                                            tuple(v for r in chunk for v in r)).rowcount
+        # pymysql connects with CLIENT_FOUND_ROWS: 1 per inserted row, 2 per updated row, 1 per unchanged row
+        inserted = len(chunk) - existing
+        updated = affected - inserted - existing
+        result.inserted += inserted
+        result.updated += updated
+        result.unchanged += existing - updated
+        result.chunks += 1
+    return result
+
+
+def _to_load_data_value(value: Any) -> str:
+    if value is None:
+        return 'NULL'
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def write_load_data_file(records: Iterable[Tuple], path: str):
+    """
+    Tab separated file for LOAD DATA: every value enclosed in double quotes and NULL as an unenclosed word,
+    with escaping disabled so backslashes are loaded as is
+    """
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for record in records:
+            f.write('\t'.join(_to_load_data_value(v) for v in record) + '\n')
+
+
+def load_data_infile_to_mysql(data: Union[List[BaseModel], TransactionBatch], mysql_param: Dict[str, str],
+                              table_name: str, fields_to_update: Optional[List[str]] = None) -> int:
+    """
+    Bulk load through a temporary file, LOAD DATA LOCAL INFILE into a temporary staging table and one set-based
+    merge into `table_name`: INSERT IGNORE, or an upsert of `fields_to_update` only.
+    The server must allow `local_infile`.
+    return: The number of staged rows
+    """
+    fields = get_data_fields(data)
+    fields_str = ", ".join([f"`{k}`" for k in fields])
+    staging_table = f"{table_name}_staging"
+    merge_query = f"INSERT {'' if fields_to_update else 'IGNORE '}INTO `{table_name}` ({fields_str}) " \
+                  f"SELECT {fields_str} FROM `{staging_table}`"
+    if fields_to_update:
+        merge_query += " ON DUPLICATE KEY UPDATE " + ", ".join([f"`{k}` = VALUES(`{k}`)" for k in fields_to_update])
+
+    fd, path = tempfile.mkstemp(suffix='.tsv')
+    os.close(fd)
+    try:
+        write_load_data_file(translate_to_sql_credit_format(data), path)
+        db = get_mysql_client(mysql_param, local_infile=True)
+        # a temporary table lives in its connection, every statement runs on the same one
+        with db.begin() as conn:
+            conn.exec_driver_sql(f"CREATE TEMPORARY TABLE IF NOT EXISTS `{staging_table}` LIKE `{table_name}`")
+            # DELETE, not TRUNCATE: TRUNCATE commits implicitly and would split the load into two transactions
+            conn.exec_driver_sql(f"DELETE FROM `{staging_table}`")
+            staged = conn.exec_driver_sql(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE `{staging_table}` CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ENCLOSED BY '\"' ESCAPED BY '' LINES TERMINATED BY '\\n' "
+                f"({fields_str})", (path,)).rowcount
+            conn.exec_driver_sql(merge_query)
+            conn.exec_driver_sql(f"DROP TEMPORARY TABLE `{staging_table}`")
+        return staged
+    finally:
+        os.remove(path)
+
+
+def _load_to_mysql(data: Union[List[BaseModel], TransactionBatch, None], mysql_param: Dict[str, str], table_name: str,
+                   fields_to_update: Optional[List[str]] = None, identifier: Optional[str] = None,
+                   chunk_size: int = DEFAULT_UPSERT_CHUNK_SIZE,
+                   load_data_threshold: Optional[int] = DEFAULT_LOAD_DATA_THRESHOLD_ROWS) -> Optional[UpsertResult]:
+    """
+    Loads of at least `load_data_threshold` rows (None to disable) take the LOAD DATA path, and fall back to
+    executemany when the server refuses local files. Transaction loads require the migrated DATETIME columns.
+    """
+    if data is None or not len(data):
+        return
+    # migrations builds on this module, imported here to avoid a circular import
+    from src.interface.common.migrations import check_datetime_columns, TRANSACTION_TABLE_NAME
+    if table_name == TRANSACTION_TABLE_NAME:
+        check_datetime_columns(mysql_param, table_name)
+    if load_data_threshold is not None and len(data) >= load_data_threshold:
+        try:
+            load_data_infile_to_mysql(data, mysql_param, table_name,
+                                      fields_to_update if fields_to_update and identifier else None)
+            return
+        except OperationalError as e:
+            if logger := get_logger():
+                logger.warning(f"LOAD DATA LOCAL INFILE failed, falling back to executemany: {e}")
     if fields_to_update and identifier:
-        query = get_update_query(table_name, data, fields_to_update, identifier)
-        fields_to_update += [identifier]
-    else:
-        query = get_insert_query(table_name, data)
-    records = translate_to_sql_credit_format(data, fields_to_update)
+        return upsert_to_mysql(data, mysql_param, table_name, fields_to_update, identifier, chunk_size)
+    db = get_mysql_client(mysql_param)
+    query = get_insert_query(table_name, data)
+    records = translate_to_sql_credit_format(data)
     result = db.execute(query, records)
     result.close()
 
 
+def benchmark_mysql_load_modes(data: Union[List[BaseModel], TransactionBatch], mysql_param: Dict[str, str],
+                               table_name: str) -> Dict[str, float]:
+    """
+    Time the executemany and LOAD DATA paths on empty scratch copies of `table_name`
+    return: Seconds per load mode
+    """
+    db = get_mysql_client(mysql_param)
+    timings = {}
+    for mode, threshold in [('executemany', None), ('load_data', 0)]:
+        scratch_table = f"{table_name}_benchmark_{mode}"
+        db.execute(f"DROP TABLE IF EXISTS `{scratch_table}`")
+        db.execute(f"CREATE TABLE `{scratch_table}` LIKE `{table_name}`")
+        try:
+            started = time.perf_counter()
+            _load_to_mysql(data, mysql_param, scratch_table, load_data_threshold=threshold)
+            timings[mode] = round(time.perf_counter() - started, 3)
+        finally:
+            db.execute(f"DROP TABLE IF EXISTS `{scratch_table}`")
+    return timings
+
+
+def migrate_legacy_transaction_ids(mysql_param: Dict[str, str], transactions: List[Dict[str, Any]],
+                                   table_name: str = 'credit_transaction') -> int:
+    """
+    One-time migration of the sha256 ids of `create_id=True` rows to the current ids, from their raw transactions.
+    They are not read from a TransactionBatch: the sha256 ids json-encode the values as scraped (10 and 10.0 differ),
+    which the typed batch columns do not keep.
+    The old -> new mapping is kept in ID_MIGRATION_TABLE_NAME, rows whose new id already exists are left as is.
+    return: The number of mapped ids
+    """
+    rows = [tuple(transaction.get(field) for field in ID_FIELDS) for transaction in transactions]
+    mapping = list(zip(generate_legacy_transaction_ids(rows), generate_transaction_ids(rows)))
+    db = get_mysql_client(mysql_param)
+    # the table also marks the migration as done, see is_transaction_id_migration_done
+    db.execute(f"""
+        CREATE TABLE IF NOT EXISTS `{ID_MIGRATION_TABLE_NAME}` (
+            old_id VARCHAR(64) NOT NULL PRIMARY KEY,
+            new_id VARCHAR(64) NOT NULL
+        )""")
+    if not mapping:
+        return 0
+    db.execute(f"INSERT IGNORE INTO `{ID_MIGRATION_TABLE_NAME}` (old_id, new_id) VALUES (%s, %s)", mapping)
+    db.execute(f"UPDATE IGNORE `{table_name}` t JOIN `{ID_MIGRATION_TABLE_NAME}` m ON t.id = m.old_id "
+               f"SET t.id = m.new_id")
+    return len(mapping)
+
+
+def is_transaction_id_migration_done(mysql_param: Dict[str, str]) -> bool:
+    row = get_mysql_client(mysql_param).execute(
+        "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (ID_MIGRATION_TABLE_NAME,)).fetchone()
+    return bool(row[0])
+
+
+# endregion
+
+# region Watermark utils
+DEFAULT_WATERMARK_OVERLAP_DAYS = 7
+
+
+def get_balance_account_numbers(mysql_param: Dict[str, str], table_name: str = 'bank_balance') -> List[str]:
+    try:
+        rows = get_mysql_client(mysql_param).execute(f"SELECT DISTINCT account_number FROM `{table_name}`")
+    except ProgrammingError:
+        return []
+    return [str(r[0]) for r in rows if r[0] is not None]
+
+
+def get_watermark(mysql_param: Dict[str, str], source: str, account_key: str,
+                  account_numbers: Optional[List[str]] = None) -> Optional[date]:
+    """
+    Get the last fully loaded transaction date of an account. Falls back to the max `date` stored in
+    credit_transaction for `account_numbers` (the account key itself by default, sources keyed by a credentials
+    block pass their account numbers) when the state table has no entry yet.
+    return: The watermark date or None for accounts that were never loaded
+    """
+    db = get_mysql_client(mysql_param)
+    try:
+        row = db.execute(f"SELECT watermark_date FROM `{WATERMARK_TABLE_NAME}` "
+                         f"WHERE source = %s AND account_key = %s", (source, account_key)).fetchone()
+    except ProgrammingError:
+        row = None
+    if not row or not row[0]:
+        account_numbers = list(account_numbers or [account_key])
+        # the lagging account bounds the watermark, as in get_watermark_from_max_dates
+        row = db.execute(f"SELECT MIN(max_date) FROM (SELECT MAX(date) AS max_date FROM `credit_transaction` "
+                         f"WHERE account_number IN ({', '.join(['%s'] * len(account_numbers))}) "
+                         f"GROUP BY account_number) m", tuple(account_numbers)).fetchone()
+    if not row or not row[0]:
+        return None
+    return datetime.strptime(str(row[0])[:10], DATE_FORMAT).date()
+
+
+def set_watermark(mysql_param: Dict[str, str], source: str, account_key: str, watermark_date: str):
+    db = get_mysql_client(mysql_param)
+    db.execute(f"""
+        CREATE TABLE IF NOT EXISTS `{WATERMARK_TABLE_NAME}` (
+            source VARCHAR(64) NOT NULL,
+            account_key VARCHAR(64) NOT NULL,
+            watermark_date DATE NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (source, account_key)
+        )""")
+    db.execute(f"INSERT INTO `{WATERMARK_TABLE_NAME}` (source, account_key, watermark_date) VALUES (%s, %s, %s) "
+               f"ON DUPLICATE KEY UPDATE watermark_date = GREATEST(watermark_date, VALUES(watermark_date))",
+               (source, account_key, watermark_date[:10]))
+
+
+def get_incremental_start_date(watermark: Optional[date], overlap_days: int = DEFAULT_WATERMARK_OVERLAP_DAYS,
+                               default_days: int = 31) -> str:
+    """
+    Minimal scrape start date: the watermark minus a safety overlap for late-posted transactions
+    return: start date string, `default_days` back for accounts without a watermark
+    """
+    if overlap_days < 0:
+        raise ValueError("overlap_days must not be negative")
+    today = datetime.now().date()
+    start_date = min(watermark, today) - timedelta(days=overlap_days) if watermark \
+        else today - timedelta(days=default_days)
+    return start_date.strftime(DATE_FORMAT)
+
+
+def track_max_transaction_dates(data: Union[Iterable[MySqlTransaction], TransactionBatch],
+                                max_dates: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    max_dates = {} if max_dates is None else max_dates
+    if isinstance(data, TransactionBatch):
+        for account_number, transaction_date in data.max_dates().items():
+            max_dates[account_number] = max(transaction_date, max_dates.get(account_number, ''))
+        return max_dates
+    for transaction in data:
+        transaction_date = str(transaction.date)[:10]
+        if transaction_date > max_dates.get(transaction.account_number, ''):
+            max_dates[transaction.account_number] = transaction_date
+    return max_dates
+
+
+def get_watermark_from_max_dates(max_dates: Dict[str, str]) -> Optional[str]:
+    # the lagging account bounds the next run, so no account can skip transactions
+    return min(max_dates.values()) if max_dates else None
+
+
 # endregion
 
 # region Mongo utils
-def load_to_mongo(mongo_doc: Optional[Dict[str, Any]], mongo_param: Dict[str, str], table_name: str):
+MONGO_WRITE_CONCERNS = {
+    'unacknowledged': WriteConcern(w=0),
+    'acknowledged': WriteConcern(w=1),
+    'majority': WriteConcern(w='majority'),
+}
+DEFAULT_MONGO_WRITE_CONCERN = 'acknowledged'
+DEFAULT_MONGO_CHUNK_SIZE = 1000
+MONGO_COLLECTION_INDEXES = {
+    MONGO_CREDIT_TABLE_NAME: 'identifier',
+    MONGO_BANK_ACCOUNT_TABLE_NAME: 'mongo_key',
+}
+_mongo_clients: Dict[Tuple, pymongo.MongoClient] = {}
+_mongo_indexes: set = set()
+_mongo_clients_lock = threading.Lock()
+
+
+def get_mongo_collection(mongo_param: Dict[str, str], table_name: str,
+                         write_concern: Optional[str] = None) -> Collection:
+    """
+    A collection of the shared client, with the write concern of `write_concern` or of mongo_param's
+    `mongo_write_concern` (unacknowledged, acknowledged or majority)
+    """
+    write_concern = write_concern or mongo_param.get('mongo_write_concern') or DEFAULT_MONGO_WRITE_CONCERN
+    if write_concern not in MONGO_WRITE_CONCERNS:
+        raise ValueError(f"unknown write concern {write_concern}, use one of {list(MONGO_WRITE_CONCERNS)}")
+    collection = get_mongo_client(mongo_param).get_collection(table_name)
+    return collection.with_options(write_concern=MONGO_WRITE_CONCERNS[write_concern])
+
+
+def ensure_mongo_index(collection: Collection, key: str, unique: bool = True):
+    """
+    Create an index once per collection and process instead of on every write
+    """
+    index_key = (id(collection.database.client), collection.full_name, key, unique)
+    if index_key in _mongo_indexes:
+        return
+    collection.create_index(key, unique=unique, background=True)
+    _mongo_indexes.add(index_key)
+
+
+def bootstrap_mongo_indexes(mongo_param: Dict[str, str]):
+    for table_name, key in MONGO_COLLECTION_INDEXES.items():
+        ensure_mongo_index(get_mongo_collection(mongo_param, table_name), key)
+
+
+def load_to_mongo(mongo_doc: Optional[Dict[str, Any]], mongo_param: Dict[str, str], table_name: str,
+                  write_concern: Optional[str] = None):
     assert 'mongo_key' in mongo_doc
-    db = get_mongo_client(mongo_param)
-    collection = db.get_collection(table_name)
-    collection.create_index('mongo_key', unique=True, background=True)
-    collection.with_options(write_concern=WriteConcern(w=0))
+    collection = get_mongo_collection(mongo_param, table_name, write_concern)
+    ensure_mongo_index(collection, 'mongo_key')
     collection.update_one(
         filter=dict(mongo_key=mongo_doc.get('mongo_key')),
         update={"$set": mongo_doc}
@@ -201,40 +611,87 @@ def load_to_mongo(mongo_doc: Optional[Dict[str, Any]], mongo_param: Dict[str, st
 def read_from_mongo(query: Dict[str, str], mongo_param: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     table_name = mongo_param.get('table_name')
     assert 'mongo_key' in query
-    db = get_mongo_client(mongo_param)
-    collection = db.get_collection(table_name)
+    collection = get_mongo_collection(mongo_param, table_name)
     return collection.find_one(query)
 
 
-def load_transactions_to_mongo(mongo_docs: Optional[List[Dict[str, Any]]], mongo_param: Dict[str, str],
-                               table_name: str):
-    db = get_mongo_client(mongo_param)
-    validate_documents(mongo_docs)
-    transformed_mongo_docs = unpack_to_unnested_format(mongo_docs)
-    transactions = db.get_collection(table_name)
-    transactions.create_index('identifier', unique=True, background=True)
-    transactions.with_options(write_concern=WriteConcern(w=0))
-    try:
-        transactions.insert_many(
-            transformed_mongo_docs
-            , ordered=False
-        )
-    except BulkWriteError as e:
-        panic_list = list(filter(lambda x: x['code'] != 11000, e.details['writeErrors']))
-        if len(panic_list) > 0:
-            raise e
-
-
-def get_mongo_client(mongo_param: Dict[str, str]):
+def filter_new_documents(collection: Collection, documents: List[Dict[str, Any]], key: str = 'identifier',
+                         lookup_chunk_size: int = DEFAULT_MONGO_CHUNK_SIZE) -> List[Dict[str, Any]]:
+    """
+    Drop documents whose `key` is already stored (batched `$in` lookups over the unique index) or repeated
+    in the batch itself
+    return: The documents to insert
+    """
+    unique_documents = list({d.get(key): d for d in documents}.values())
+    keys = [d.get(key) for d in unique_documents]
+    existing = set()
+    for start in range(0, len(keys), lookup_chunk_size):
+        chunk = keys[start:start + lookup_chunk_size]
+        existing.update(d[key] for d in collection.find({key: {'$in': chunk}}, projection={key: True, '_id': False}))
+    return [d for d in unique_documents if d.get(key) not in existing]
+
+
+def load_transactions_to_mongo(mongo_docs: Union[List[Dict[str, Any]], TransactionBatch, None],
+                               mongo_param: Dict[str, str], table_name: str, account_number: str = 'NA',
+                               write_concern: Optional[str] = None,
+                               chunk_size: int = DEFAULT_MONGO_CHUNK_SIZE) -> MongoIngestResult:
+    """
+    Insert only transactions that are not stored yet, in chunks of `chunk_size`
+    return: The new and duplicate document counts
+    """
+    if isinstance(mongo_docs, TransactionBatch):
+        transformed_mongo_docs = mongo_docs.to_documents()
+        validate_documents(transformed_mongo_docs)
+    else:
+        validate_documents(mongo_docs)
+        transformed_mongo_docs = unpack_to_unnested_format(mongo_docs, account_number)
+    transactions = get_mongo_collection(mongo_param, table_name, write_concern)
+    ensure_mongo_index(transactions, 'identifier')
+    new_documents = filter_new_documents(transactions, transformed_mongo_docs, 'identifier', chunk_size)
+    result = MongoIngestResult(new=len(new_documents), duplicates=len(transformed_mongo_docs) - len(new_documents))
+    for start in range(0, len(new_documents), chunk_size):
+        try:
+            transactions.insert_many(new_documents[start:start + chunk_size], ordered=False)
+        except BulkWriteError as e:
+            # documents written concurrently since the lookup are still duplicates
+            panic_list = list(filter(lambda x: x['code'] != 11000, e.details['writeErrors']))
+            if len(panic_list) > 0:
+                raise e
+            raced = len(e.details['writeErrors'])
+            result.new -= raced
+            result.duplicates += raced
+    if logger := get_logger():
+        logger.info(f"{table_name}: {result.new} new and {result.duplicates} duplicate transactions "
+                    f"({result.duplicate_ratio:.0%} duplicates)")
+    return result
+
+
+def get_mongo_client(mongo_param: Dict[str, str]) -> Database:
+    """
+    return: The database of a process-wide MongoClient, cached by connection parameters
+    """
     env = "PROD"
     host = "local" if get_running_env(env) == "DEV" else LOCAL_UBUNTU_HOST
-    host = host
     port = mongo_param.get('mongo_port')
     username = mongo_param.get('mongo_username')
     password = mongo_param.get('mongo_password')
-    uri = f"mongodb://{username}:{password}@{host}:{port}"
-    db = pymongo.MongoClient(uri)
-    return db['prod-db']
+    key = (host, port, username, password)
+    with _mongo_clients_lock:
+        if key not in _mongo_clients:
+            uri = f"mongodb://{username}:{password}@{host}:{port}"
+            _mongo_clients[key] = pymongo.MongoClient(uri)
+        return _mongo_clients[key]['prod-db']
+
+
+def _reset_mongo_clients_after_fork():
+    # MongoClient is not fork-safe, a child opens its own clients
+    global _mongo_clients_lock
+    _mongo_clients_lock = threading.Lock()
+    _mongo_clients.clear()
+    _mongo_indexes.clear()
+
+
+os.register_at_fork(after_in_child=_reset_mongo_clients_after_fork)
 
 
 def create_mongo_key(ingredients: Iterable[str]) -> str:
@@ -7,4 +7,14 @@ BASE_TRAINING_DATA_BUCKET_PATH = "gs://house-finance/clearml/training_data/categ
 BASE_MODEL_STORAGE_BUCKET_PATH = "gs://house-finance/clearml/models"
 NAME_COLUMN = "normalized"
 TYPE_COLUMN = "type"
-CATEGORY_RAW_COLUMN = "category_raw"
\ No newline at end of file
+CATEGORY_RAW_COLUMN = "category_raw"
+# explicit dtypes of the transactions read for training and serving
+TRANSACTION_DTYPES = {
+    "date": "datetime64[ns]",
+    "processed_date": "datetime64[ns]",
+    "charged_amount": "float32",
+    "description": "category",
+    "category_name": "category",
+    "category_raw": "category",
+    "account_number": "category",
+}
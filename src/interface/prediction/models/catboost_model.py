@@ -20,6 +20,8 @@ class CategoryCatboost(CatBoostClassifier):
         categorical_features = [self.feature_names_[x] for x in self.get_cat_feature_indices()] if self.is_fitted() else self.get_param("cat_features")
         if categorical_features:
             for c in categorical_features:
+                if isinstance(df[c].dtype, pd.CategoricalDtype) and "MISSING" not in df[c].cat.categories:
+                    df[c] = df[c].cat.add_categories("MISSING")
                 df[c] = df[c].fillna("MISSING")
         return df
 
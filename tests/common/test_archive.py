@@ -0,0 +1,28 @@
+from src.interface.common.archive import RawScrapeArchive
+
+SCRAPED = {"accounts": [{"accountNumber": "5094", "txns": [
+    {"identifier": 1, "date": "2023-04-30T00:00:00.000Z", "description": "a", "chargedAmount": -1},
+    {"identifier": 2, "date": "2023-05-03T00:00:00.000Z", "description": "b", "chargedAmount": -2},
+]}]}
+
+
+def test_archive_partitions_by_month_and_reads_back_once(tmp_path):
+    archive = RawScrapeArchive(str(tmp_path))
+    entries = archive.write("isracard", SCRAPED)
+    archive.write("isracard", SCRAPED)
+    assert sorted(e.month for e in entries) == ["2023-04", "2023-05"]
+    assert all(e.path.startswith("source=isracard/account=5094/") for e in entries)
+    batch = archive.read("isracard", start_month="2023-05")
+    assert [d["identifier"] for d in batch.to_documents()] == [2]
+    assert len(archive.read("isracard")) == 2
+
+
+def test_writer_keeps_one_file_per_month_across_chunks(tmp_path):
+    archive = RawScrapeArchive(str(tmp_path))
+    with archive.open_writer("isracard") as writer:
+        writer.write(SCRAPED)
+        writer.write(SCRAPED)
+        assert not list(archive.iter_entries())
+    assert sorted((e.month, e.rows) for e in writer.entries) == [("2023-04", 2), ("2023-05", 2)]
+    assert len(list(tmp_path.rglob("*.parquet"))) == 2 and not list(tmp_path.rglob("*.tmp"))
+    assert len(archive.read("isracard")) == 2
@@ -0,0 +1,22 @@
+import asyncio
+import threading
+import time
+
+from src.interface.common.async_db import run_in_db_executor
+
+
+def test_db_calls_run_concurrently_off_the_event_loop():
+    loop_thread = threading.get_ident()
+
+    def blocking_query():
+        time.sleep(0.2)
+        return threading.get_ident()
+
+    async def run():
+        start = time.monotonic()
+        threads = await asyncio.gather(run_in_db_executor(blocking_query), run_in_db_executor(blocking_query))
+        return threads, time.monotonic() - start
+
+    threads, elapsed = asyncio.run(run())
+    assert loop_thread not in threads
+    assert elapsed < 0.35
@@ -0,0 +1,10 @@
+from src.interface.common.backfill import BackfillCheckpoint
+
+
+def test_checkpoint_resumes_completed_months(tmp_path):
+    checkpoint = BackfillCheckpoint.for_backfill("isracard", ["category_raw"], "5094", directory=str(tmp_path))
+    checkpoint.mark_completed("2024-01")
+    resumed = BackfillCheckpoint.for_backfill("isracard", ["category_raw"], "5094", directory=str(tmp_path))
+    assert resumed.completed == {"2024-01"}
+    resumed.clear()
+    assert not list(tmp_path.iterdir())
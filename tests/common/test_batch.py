@@ -0,0 +1,35 @@
+from src.interface.common.batch import TransactionBatch
+from src.interface.common.ids import generate_transaction_id
+from src.interface.common.utils import translate_to_mysql_format, unpack_to_unnested_format, \
+    translate_to_sql_credit_format, track_max_transaction_dates
+
+SCRAPED = {"accounts": [{"accountNumber": "5094", "txns": [
+    {"identifier": 123, "date": "2023-05-03T00:00:00.000Z", "processedDate": "2023-06-02T00:00:00.000Z",
+     "originalAmount": -10, "chargedAmount": -10, "description": "שופרסל", "memo": "", "type": "normal",
+     "category": "מזון"},
+    {"identifier": None, "date": "2023-05-07T00:00:00.000Z", "processedDate": "2023-06-02T00:00:00.000Z",
+     "originalAmount": -5.5, "chargedAmount": -5.5, "description": "AMAZON", "memo": None, "type": "normal"},
+]}]}
+
+
+def test_batch_matches_row_wise_translation():
+    batch = TransactionBatch.from_scraped(SCRAPED).to_mysql_format(create_id=True)
+    rows = translate_to_mysql_format(unpack_to_unnested_format(SCRAPED), create_id=True)
+    assert translate_to_sql_credit_format(batch) == translate_to_sql_credit_format(rows)
+    assert track_max_transaction_dates(batch) == {"5094": "2023-05-07"}
+    assert batch.frame["date"].tolist() == ["2023-05-03 00:00:00", "2023-05-07 00:00:00"]
+
+
+def test_batch_documents_keep_scraped_keys():
+    documents = TransactionBatch.from_scraped(SCRAPED).to_documents()
+    assert "category" not in documents[1]
+    assert documents[0]["accountNumber"] == "5094" and documents[0]["identifier"] == 123
+
+
+def test_batch_columns_are_typed_and_ids_match_the_raw_transactions():
+    batch = TransactionBatch.from_scraped(SCRAPED)
+    assert str(batch.frame["chargedAmount"].dtype) == "float64" and str(batch.frame["identifier"].dtype) == "Int64"
+    assert str(batch.frame["description"].dtype) == "string"
+    raw_ids = [generate_transaction_id(t) for t in SCRAPED["accounts"][0]["txns"]]
+    assert batch.get_ids() == raw_ids
+    assert batch.to_mysql_format(create_id=True).to_rows(["id", "notes"]) == [(raw_ids[0], ""), (raw_ids[1], None)]
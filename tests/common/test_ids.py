@@ -0,0 +1,26 @@
+from src.interface.common.ids import generate_transaction_ids, encode_id_fields, TransactionIdCache
+
+
+def test_ids_are_stable_and_length_prefixed():
+    assert generate_transaction_ids([(1, "ab", "2024-01-01", "2024-02-01", -10)]) == \
+           generate_transaction_ids([(1, "ab", "2024-01-01", "2024-02-01", -10.0)])
+    assert encode_id_fields(("a", "bc")) != encode_id_fields(("ab", "c"))
+    assert encode_id_fields((None,)) != encode_id_fields(("None",))
+    assert len(generate_transaction_ids([(1, "ab", None, None, 0)])[0]) == 64
+
+
+def test_id_cache_skips_seen_ids(tmp_path):
+    cache = TransactionIdCache(str(tmp_path / "ids.sqlite"))
+    cache.add(["a", "b"])
+    assert cache.contains(["a", "c", "b"]) == [True, False, True]
+
+
+def test_id_cache_expires_and_clears(tmp_path):
+    cache = TransactionIdCache(str(tmp_path / "ids.sqlite"), ttl_seconds=60)
+    cache.add(["a"])
+    cache.ttl_seconds = -1
+    assert cache.contains(["a"]) == [False]
+    cache.ttl_seconds = 60
+    assert cache.contains(["a"]) == [True]
+    cache.clear()
+    assert cache.contains(["a"]) == [False]
@@ -0,0 +1,73 @@
+import os
+from datetime import date, timedelta
+
+import pytest
+
+from src.interface.common import migrations
+from src.interface.common.migrations import migrate_transaction_schema, explain, is_full_scan, get_columns, \
+    check_datetime_columns
+from src.interface.common.utils import get_mysql_client
+
+SCRATCH_TABLE = "credit_transaction_explain_test"
+RANGE_READS = [
+    # serving
+    f"SELECT id, processed_date, charged_amount FROM {SCRATCH_TABLE} "
+    f"WHERE date BETWEEN '2023-08-01' AND '2023-08-31'",
+    # training
+    f"SELECT id, category FROM {SCRATCH_TABLE} WHERE processed_date BETWEEN '2023-08-01' AND '2023-08-31' "
+    f"ORDER BY processed_date DESC",
+    # watermark
+    f"SELECT MAX(date) FROM {SCRATCH_TABLE} WHERE account_number = '1029'",
+]
+
+
+@pytest.fixture()
+def mysql_param():
+    mysql_param = {k: os.getenv(k.upper()) for k in
+                   ["mysql_host", "mysql_port", "mysql_database", "mysql_username", "mysql_password"]}
+    if not all(mysql_param.values()):
+        pytest.skip("set the MYSQL_* environment variables to run the EXPLAIN checks")
+    db = get_mysql_client(mysql_param)
+    db.execute(f"DROP TABLE IF EXISTS `{SCRATCH_TABLE}`")
+    db.execute(f"""
+        CREATE TABLE `{SCRATCH_TABLE}` (
+            id VARCHAR(64) NOT NULL PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            date VARCHAR(32) NOT NULL,
+            processed_date VARCHAR(32) NOT NULL,
+            charged_amount FLOAT NOT NULL,
+            category INT NULL,
+            account_number VARCHAR(32) NOT NULL
+        )""")
+    rows = [(str(i), f"merchant {i % 50}", f"{date(2020, 1, 1) + timedelta(days=i // 4)}T21:00:00.000Z",
+             f"{date(2020, 1, 10) + timedelta(days=i // 4)}T00:00:00.000Z", -i, i % 30, ["1029", "5094"][i % 2])
+            for i in range(4000)]
+    db.execute(f"INSERT INTO `{SCRATCH_TABLE}` VALUES (%s, %s, %s, %s, %s, %s, %s)", rows)
+    yield mysql_param
+    db.execute(f"DROP TABLE IF EXISTS `{SCRATCH_TABLE}`")
+
+
+def test_range_reads_use_indexes_after_migration(mysql_param):
+    assert all(is_full_scan(explain(mysql_param, query)) for query in RANGE_READS[:2])
+    migrated = migrate_transaction_schema(mysql_param, SCRATCH_TABLE)
+    assert migrated["columns"] == ["date", "processed_date"]
+    get_mysql_client(mysql_param).execute(f"ANALYZE TABLE `{SCRATCH_TABLE}`")
+
+    columns = {c["name"]: c for c in get_columns(get_mysql_client(mysql_param), SCRATCH_TABLE)}
+    assert columns["date"]["data_type"] == "datetime" and not columns["date"]["nullable"]
+    for query in RANGE_READS:
+        assert not is_full_scan(explain(mysql_param, query)), query
+    assert migrate_transaction_schema(mysql_param, SCRATCH_TABLE) == dict(columns=[], indexes=[])
+
+
+def test_loads_are_refused_until_the_date_columns_are_migrated(monkeypatch):
+    columns = [dict(name="date", data_type="varchar", nullable=False)]
+    monkeypatch.setattr(migrations, "get_mysql_client", lambda param: None)
+    monkeypatch.setattr(migrations, "get_columns", lambda db, table: columns)
+    param = dict(mysql_host="h", mysql_port="3306", mysql_database="check")
+    with pytest.raises(RuntimeError, match="migrate_transaction_schema_flow"):
+        check_datetime_columns(param, "credit_transaction")
+    columns[0]["data_type"] = "datetime"
+    check_datetime_columns(param, "credit_transaction")
+    columns[0]["data_type"] = "varchar"
+    check_datetime_columns(param, "credit_transaction")
@@ -0,0 +1,21 @@
+import pytest
+
+from src.interface.common.normalizer import TransactionNormalizer, detect_schema
+
+TRANSACTIONS = [{"identifier": 1, "date": "2024-01-02T00:00:00.000Z"},
+                {"identifier": 2, "date": "2024-01-05T00:00:00.000Z"}]
+
+
+def test_dicts_of_transactions_are_flattened_without_mutation():
+    data = [{"0": {"accountNumber": 5094, "index": 0, "txns": TRANSACTIONS}}]
+    normalizer = TransactionNormalizer(data)
+    records = list(normalizer)
+    assert detect_schema(data) == 'list_of_dicts_of_transactions'
+    assert [(r["identifier"], r["accountNumber"], r["index"]) for r in records] == [(1, "5094", 0), (2, "5094", 0)]
+    assert "accountNumber" not in TRANSACTIONS[0]
+    assert normalizer.max_dates == {"5094": "2024-01-05T00:00:00.000Z"}
+
+
+def test_unknown_schema_is_rejected():
+    with pytest.raises(ValueError):
+        TransactionNormalizer([1, 2])
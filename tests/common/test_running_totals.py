@@ -0,0 +1,24 @@
+import pandas as pd
+
+from src.interface.common.batch import TransactionBatch
+from src.interface.common.running_totals import get_affected_months
+
+SCRAPED = {"accounts": [{"accountNumber": "5094", "txns": [
+    {"identifier": 1, "date": "2023-05-31T21:00:00.000Z", "processedDate": "2023-06-02T00:00:00.000Z",
+     "originalAmount": -10, "chargedAmount": -10, "description": "a", "type": "normal"},
+    {"identifier": 2, "date": "2023-06-01T00:00:00.000Z", "processedDate": "2023-07-02T00:00:00.000Z",
+     "originalAmount": -5, "chargedAmount": -5, "description": "b", "type": "normal"},
+]}]}
+
+
+def test_affected_months_merge_loaded_and_predicted_transactions():
+    batch = TransactionBatch.from_scraped(SCRAPED).to_mysql_format()
+    affected = get_affected_months(batch)
+    assert affected == {"2023-05": {"5094"}, "2023-06": {"5094"}}
+    predicted = pd.DataFrame({"date": pd.to_datetime(["2023-06-03", None]), "account_number": ["1029", "1029"]})
+    assert get_affected_months(predicted, affected) == {"2023-05": {"5094"}, "2023-06": {"5094", "1029"}}
+
+
+def test_affected_months_of_raw_scrapes():
+    batch = TransactionBatch.from_scraped(SCRAPED)
+    assert get_affected_months(batch, account_field="accountNumber") == {"2023-05": {"5094"}, "2023-06": {"5094"}}
@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from src.core.common import DATE_FORMAT
+from src.interface.common.model import MySqlTransaction
+from src.interface.common import utils
+from src.interface.common.utils import iter_account_chunks, get_incremental_start_date, \
+    track_max_transaction_dates, get_watermark_from_max_dates, get_mysql_client, get_mysql_pool_stats, \
+    get_mongo_client, get_mongo_collection, get_upsert_query, write_load_data_file, \
+    filter_new_documents, cast_dtypes, concat_batches, upsert_to_mysql
+
+
+def test_iter_account_chunks_is_bounded_and_keeps_accounts_apart():
+    records = [{"identifier": i, "accountNumber": "1029"} for i in range(5)] \
+              + [{"identifier": i, "accountNumber": "5094"} for i in range(2)]
+    chunks = list(iter_account_chunks(iter(records), chunk_size=2))
+    assert [(account, len(chunk)) for account, chunk in chunks] == [("1029", 2), ("1029", 2), ("1029", 1),
+                                                                    ("5094", 2)]
+
+
+def test_iter_account_chunks_rejects_empty_chunks():
+    with pytest.raises(ValueError):
+        list(iter_account_chunks(iter([]), chunk_size=0))
+
+
+def test_incremental_start_date_applies_overlap_to_watermark():
+    watermark = datetime.now().date() - timedelta(days=2)
+    expected = (watermark - timedelta(days=3)).strftime(DATE_FORMAT)
+    assert get_incremental_start_date(watermark, overlap_days=3) == expected
+
+
+def test_incremental_start_date_defaults_without_watermark():
+    expected = (datetime.now().date() - timedelta(days=31)).strftime(DATE_FORMAT)
+    assert get_incremental_start_date(None, default_days=31) == expected
+
+
+def test_watermark_is_bounded_by_the_lagging_account():
+    transactions = [MySqlTransaction(id=str(i), description="d", notes=None, date=d, processed_date=d,
+                                     charged_amount=1., original_amount=1., category=None, category_raw=None,
+                                     account_number=account, type=None)
+                    for i, (account, d) in enumerate([("1029", "2024-03-05T00:00:00.000Z"),
+                                                      ("1029", "2024-03-09T00:00:00.000Z"),
+                                                      ("5094", "2024-03-07T00:00:00.000Z")])]
+    max_dates = track_max_transaction_dates(transactions)
+    assert max_dates == {"1029": "2024-03-09", "5094": "2024-03-07"}
+    assert get_watermark_from_max_dates(max_dates) == "2024-03-07"
+
+
+def test_mysql_engines_are_shared_per_connection():
+    param = dict(mysql_host="localhost", mysql_port="3306", mysql_database="finance", mysql_username="u",
+                 mysql_password="p")
+    engine = get_mysql_client(param)
+    assert get_mysql_client(dict(param)) is engine
+    assert get_mysql_client({**param, "mysql_database": "other"}) is not engine
+    assert get_mysql_pool_stats()["u@localhost:3306/finance"]["checked_out"] == 0
+
+
+def test_mongo_clients_are_shared_and_keep_the_write_concern():
+    param = dict(mongo_port="27017", mongo_username="u", mongo_password="p")
+    assert get_mongo_client(param).client is get_mongo_client(dict(param)).client
+    assert get_mongo_collection(param, "features", "majority").write_concern.document == {"w": "majority"}
+    with pytest.raises(ValueError):
+        get_mongo_collection(param, "features", "fire-and-forget")
+
+
+def test_upsert_query_updates_only_listed_fields():
+    query = get_upsert_query("credit_transaction", ["id", "description", "category_raw"], ["category_raw"], 2)
+    assert query == "INSERT INTO `credit_transaction` (`id`, `description`, `category_raw`) " \
+                    "VALUES (%s, %s, %s), (%s, %s, %s) ON DUPLICATE KEY UPDATE `category_raw` = VALUES(`category_raw`)"
+
+
+def test_load_data_file_encloses_values_and_keeps_nulls(tmp_path):
+    path = tmp_path / "rows.tsv"
+    write_load_data_file([("1", 'say "hi"\tback\\slash', None, -1.5)], str(path))
+    assert path.read_text(encoding="utf-8") == '"1"\t"say ""hi""\tback\\slash"\tNULL\t"-1.5"\n'
+
+
+class UpsertResultProxy:
+    def __init__(self, count):
+        self.rowcount = count
+
+    def scalar(self):
+        return self.rowcount
+
+
+class UpsertConnection:
+    """
+    Stand-in for a pymysql connection: ids in `stored` exist and every upserted row changes, affected rows are
+    counted as with CLIENT_FOUND_ROWS
+    """
+
+    def __init__(self, stored):
+        self.stored = stored
+        self.upserted = []
+
+    def begin(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def exec_driver_sql(self, query, params):
+        if query.startswith("SELECT COUNT(*)"):
+            return UpsertResultProxy(sum(i in self.stored for i in params))
+        id_index, num_fields = list(MySqlTransaction.__fields__).index("id"), len(MySqlTransaction.__fields__)
+        ids = params[id_index::num_fields]
+        self.upserted.extend(ids)
+        return UpsertResultProxy(sum(2 if i in self.stored else 1 for i in ids))
+
+
+def test_upsert_counts_a_repeated_id_once(monkeypatch):
+    connection = UpsertConnection(stored={"1"})
+    monkeypatch.setattr(utils, "get_mysql_client", lambda _: connection)
+    rows = [MySqlTransaction(id=i, description=d, date="2023-08-01 00:00:00", processed_date="2023-08-10 00:00:00",
+                             charged_amount=-1, original_amount=-1, account_number="1029")
+            for i, d in [("1", "a"), ("2", "b"), ("2", "c")]]
+    result = upsert_to_mysql(rows, {}, "credit_transaction", ["description"])
+    assert (result.inserted, result.updated, result.unchanged) == (1, 1, 0)
+    assert connection.upserted == ["1", "2"]
+
+
+class StoredIdentifiers:
+    def __init__(self, identifiers):
+        self.identifiers = identifiers
+        self.lookups = 0
+
+    def find(self, query, projection):
+        self.lookups += 1
+        return [{"identifier": i} for i in query["identifier"]["$in"] if i in self.identifiers]
+
+
+def test_only_new_documents_are_kept():
+    collection = StoredIdentifiers({1, 2})
+    documents = [{"identifier": i} for i in [1, 2, 3, 3, 4]]
+    assert filter_new_documents(collection, documents, lookup_chunk_size=2) == [{"identifier": 3}, {"identifier": 4}]
+    assert collection.lookups == 2
+
+
+def test_typed_batches_keep_their_dtypes_when_concatenated():
+    dtypes = {"processed_date": "datetime64[ns]", "charged_amount": "float32", "account_number": "category"}
+    batches = [cast_dtypes(pd.DataFrame({"processed_date": ["2023-08-01"], "charged_amount": [10.5],
+                                         "account_number": ["1029"]}), dtypes),
+               cast_dtypes(pd.DataFrame({"processed_date": ["2023-08-02"], "charged_amount": [3],
+                                         "account_number": ["5094"]}), dtypes)]
+    df = concat_batches(batches)
+    assert str(df["processed_date"].dtype) == "datetime64[ns]"
+    assert df["charged_amount"].dtype == "float32"
+    assert list(df["account_number"].cat.categories) == ["1029", "5094"]
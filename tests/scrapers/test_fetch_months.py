@@ -0,0 +1,64 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from src.core.collection.scrapers.basescraperwithbrowser import BaseScraperWithBrowser
+from src.interface.collection.isracard.scraper import IsracardScraper
+
+START_DATE = date(2023, 1, 1)
+
+
+class MonthScraper(BaseScraperWithBrowser):
+    def __init__(self, failures=None, **options):
+        super().__init__(future_months_to_scrape=6, month_retry_delay_seconds=0, **options)
+        self.failures = failures or {}
+        self.in_flight = self.max_in_flight = 0
+        self.calls = []
+
+    async def fetch_and_process_transaction(self, page, start_date, end_month):
+        self.calls.append(end_month)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.failures.get(end_month, 0):
+                self.failures[end_month] -= 1
+                raise ConnectionError("rate limited")
+            return {str(end_month): []}
+        finally:
+            self.in_flight -= 1
+
+
+def test_months_are_fetched_with_bounded_concurrency():
+    scraper = MonthScraper(max_concurrent_months=2)
+    result = asyncio.run(scraper.fetch_all_transactions(None, START_DATE))
+    assert len(result) == 6 and scraper.max_in_flight == 2
+    assert len(set(scraper.calls)) == len(scraper.calls)
+
+
+def test_failed_month_is_retried_then_reported():
+    flaky, broken = date(2023, 3, 1), date(2023, 5, 1)
+    scraper = MonthScraper(failures={flaky: 1, broken: 10}, allow_partial_results=True)
+    result = asyncio.run(scraper.fetch_all_transactions(None, START_DATE))
+    assert scraper.failed_months == [broken]
+    assert scraper.calls.count(flaky) == 2 and {str(flaky): []} in result
+    assert result[3] == {}
+
+
+def test_failed_month_fails_the_fetch_without_partial_results():
+    scraper = MonthScraper(failures={date(2023, 5, 1): 10})
+    with pytest.raises(ConnectionError):
+        asyncio.run(scraper.fetch_all_transactions(None, START_DATE))
+    assert scraper.failed_months == [date(2023, 5, 1)]
+    assert MonthScraper().failed_months == []
+
+
+def test_cached_accounts_keep_the_billing_day_of_the_template_month():
+    accounts = [{"index": 0, "account_number": "5094", "processed_date": "2023-01-02"},
+                {"index": 1, "account_number": "1029", "processed_date": "2023-01-31"}]
+    shifted = IsracardScraper._shift_accounts_to_month(date(2023, 1, 1), accounts, date(2023, 4, 1))
+    assert [a["processed_date"] for a in shifted] == ["2023-04-02", "2023-04-30"]
+    shifted = IsracardScraper._shift_accounts_to_month(date(2023, 1, 1), accounts, date(2022, 11, 1))
+    assert [a["processed_date"] for a in shifted] == ["2022-11-02", "2022-11-30"]
+    assert accounts[0]["processed_date"] == "2023-01-02"
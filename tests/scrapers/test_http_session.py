@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+from yarl import URL
+
+from src.core.collection.scrapers.http_session import build_cookie_jar
+
+BROWSER_COOKIES = [
+    {"name": "auth", "value": "a1", "domain": ".isracard.co.il", "path": "/", "secure": True,
+     "expires": time.time() + 3600},
+    {"name": "host", "value": "h1", "domain": "digital.isracard.co.il", "path": "/services", "expires": -1},
+]
+
+
+def test_cookie_jar_keeps_domain_path_and_secure_attributes():
+    async def filter_cookies(url):
+        jar = build_cookie_jar(BROWSER_COOKIES)
+        return {name: morsel.value for name, morsel in jar.filter_cookies(URL(url)).items()}
+
+    assert asyncio.run(filter_cookies("https://digital.isracard.co.il/services/x")) == {"auth": "a1", "host": "h1"}
+    assert asyncio.run(filter_cookies("https://digital.isracard.co.il/other")) == {"auth": "a1"}
+    assert asyncio.run(filter_cookies("http://digital.isracard.co.il/services/x")) == {"host": "h1"}
+
+
+def test_host_only_cookies_are_not_sent_to_subdomains():
+    async def filter_cookies(url):
+        jar = build_cookie_jar(BROWSER_COOKIES)
+        return {name: morsel.value for name, morsel in jar.filter_cookies(URL(url)).items()}
+
+    assert asyncio.run(filter_cookies("https://api.digital.isracard.co.il/services/x")) == {"auth": "a1"}
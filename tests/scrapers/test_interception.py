@@ -0,0 +1,13 @@
+from src.core.collection.scrapers.interception import RequestInterceptor
+
+
+def test_blocks_by_resource_type_and_url_pattern():
+    interceptor = RequestInterceptor(blocked_url_patterns=[r'detector-dom\.min\.js'])
+    assert interceptor.should_block("https://digital.isracard.co.il/logo.png", "image")
+    assert interceptor.should_block("https://digital.isracard.co.il/js/detector-dom.min.js", "script")
+    assert not interceptor.should_block("https://digital.isracard.co.il/personalarea/Login", "document")
+
+
+def test_allow_list_wins_over_block_list():
+    interceptor = RequestInterceptor(allowed_url_patterns=[r'captcha'])
+    assert not interceptor.should_block("https://digital.isracard.co.il/captcha.png", "image")
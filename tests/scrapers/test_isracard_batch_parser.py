@@ -0,0 +1,41 @@
+from datetime import date
+
+import pytest
+
+from src.interface.collection.isracard.batch_parser import parse_transaction_block, parse_installments
+
+RAW_TRANSACTIONS = [
+    {"dealSumType": "0", "voucherNumberRatz": "123", "voucherNumberRatzOutbound": None, "dealSum": 100.5,
+     "paymentSum": 100.5, "dealSumOutbound": None, "fullPurchaseDate": "03/05/2023", "currencyId": 'ש"ח',
+     "fullSupplierNameHeb": "שופרסל", "moreInfo": None},
+    {"dealSumType": "0", "voucherNumberRatz": None, "voucherNumberRatzOutbound": "456", "dealSumOutbound": 20,
+     "paymentSumOutbound": 75.2, "fullPurchaseDateOutbound": "28/04/2023", "currencyId": "USD",
+     "fullSupplierNameOutbound": "AMAZON", "moreInfo": "תשלום 2 מתוך 3"},
+    {"dealSumType": "1", "voucherNumberRatz": "789", "dealSum": 1, "paymentSum": 1,
+     "fullPurchaseDate": "01/05/2023", "currencyId": "ILS", "fullSupplierNameHeb": "canceled"},
+]
+
+
+def test_parse_installments():
+    assert parse_installments("תשלום 2 מתוך 3") == dict(number=2, total=3)
+    assert parse_installments("תשלום") is None
+    assert parse_installments(None) is None
+
+
+def test_parse_transaction_block():
+    batch = parse_transaction_block(RAW_TRANSACTIONS, "2023-05-10")
+    transactions = batch.to_transactions()
+    assert len(transactions) == 2
+    domestic, abroad = transactions
+    assert domestic.identifier == "123" and domestic.chargedAmount == -100.5
+    assert domestic.originalCurrency == "ILS" and domestic.date == "2023-05-03T00:00:00"
+    assert abroad.identifier == "456" and abroad.chargedAmount == -75.2 and abroad.description == "AMAZON"
+    assert abroad.installments.total == 3
+    assert len(batch.filter_old_transactions(date(2023, 5, 1), combine_installments=False)) == 1
+
+
+def test_parse_transaction_block_keeps_missing_currencies_and_rejects_bad_dates():
+    batch = parse_transaction_block([{**RAW_TRANSACTIONS[0], "currencyId": None}], "2023-05-10")
+    assert list(batch.columns["original_currency"]) == [None]
+    with pytest.raises(ValueError):
+        parse_transaction_block([{**RAW_TRANSACTIONS[0], "fullPurchaseDate": "3/5/2023"}], "2023-05-10")
@@ -31,8 +31,8 @@ def credentials():
 
 
 async def close_browser(scraper: BaseScraper):
-    if hasattr(scraper, 'browser'):
-        await scraper.browser.close()
+    await scraper.terminate()
+    await scraper.browser_manager.close()
 
 
 def test_login(scraper, credentials):
@@ -0,0 +1,16 @@
+import importlib
+
+import pytest
+
+
+@pytest.mark.parametrize("module", [
+    "src.core.collection.scrapers.browser_manager",
+    "src.core.collection.scrapers.interception",
+    "src.core.collection.scrapers.http_session",
+    "src.core.collection.scrapers.session_store",
+    "src.core.collection.scrapers.basescraperwithbrowser",
+    "src.interface.collection.isracard.scraper",
+    "src.interface.collection.otsar_hahayal.scraper",
+])
+def test_scraper_modules_import(module):
+    assert importlib.import_module(module)
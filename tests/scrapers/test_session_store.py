@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from cryptography.fernet import Fernet
+
+from src.core.collection.scrapers.session_store import EncryptedSessionStore
+
+
+def test_session_round_trip_is_encrypted(tmp_path):
+    store = EncryptedSessionStore(directory=str(tmp_path), key=Fernet.generate_key())
+    session = {"cookies": [{"name": "sid", "value": "secret-cookie"}], "local_storage": {}, "url": "https://x"}
+    store.save("noam-isracard-cred", session)
+    assert b"secret-cookie" not in next(tmp_path.iterdir()).read_bytes()
+    assert store.load("noam-isracard-cred") == session
+
+
+def test_expired_session_is_dropped(tmp_path):
+    store = EncryptedSessionStore(directory=str(tmp_path), key=Fernet.generate_key(), max_age=timedelta(seconds=-1))
+    store.save("eden-isracard-cred", {"cookies": []})
+    assert store.load("eden-isracard-cred") is None
+    assert not list(tmp_path.iterdir())